@@ -1,32 +1,83 @@
-from flask import Flask, render_template, jsonify, request, redirect, url_for, flash, send_from_directory, Response
+from flask import Flask, render_template, jsonify, request, redirect, url_for, flash, send_from_directory, send_file, Response, abort
+from werkzeug.security import safe_join
 from pathlib import Path
-import yaml
-import markdown
 import os
+from config import load_config, CACHE_DIR
 from blog_routes import init_blog_routes
-from datetime import datetime
-import xml.etree.ElementTree as ET
-import re
+from blog_search import init_search
+from related_posts import init_related_posts
+from assets import init_assets, file_digest, IMMUTABLE_MAX_AGE
+from css_bundler import init_css_bundles
+from config_registry import init_configs
+from section_store import SectionStore
+from http_cache import init_http_cache
+from sitemap import init_sitemap
+from feeds import init_feeds
+from metrics import init_metrics, span
+from prewarm import init_prewarm
+from audio import init_audio
+from images import init_images, image_formats, MIME_TYPES, QUALITY, SOURCE_EXTENSIONS
 
 app = Flask(__name__)
-app.secret_key = 'your-secret-key-here'  # Required for flash messages
 
 # Configuration
 app.config.update(
-    DEBUG=True,
     CONTENT_DIR=Path('content'),
+    BLOG_RENDER_CACHE_SIZE=128,  # Rendered blog posts kept in memory
+    CONTENT_SNAPSHOT_PATH=os.path.join(CACHE_DIR, 'content-index.pickle'),  # Parsed posts, loaded instead of re-parsing on startup
+    CONTENT_GENERATION_FILE=os.path.join(CACHE_DIR, 'content-generation'),  # Bumped after blog writes so every worker rescans
+    BLOG_LOCK_DIR=os.path.join(CACHE_DIR, 'locks'),  # Per-post lock files for add/edit
+    BLOGS_PER_PAGE=10,  # Posts per /blogs page and default /api/blogs batch
+    FEED_SIZE=20,  # Newest posts included in /feed.xml, /atom.xml and /feed.json
+    STATIC_MAX_AGE=300,  # Cache lifetime for /static URLs without a content hash
+    CSS_BUNDLING=True,  # Serve one minified stylesheet bundle instead of individual files
+    IMAGE_CACHE_DIR=os.path.join(CACHE_DIR, 'images'),  # Resized variants served by /img
+    IMAGE_CACHE_MAX_BYTES=256 * 1024 * 1024,  # Least recently used variants are evicted past this
+    IMAGE_WIDTHS=[160, 320, 640, 960, 1280, 1920],  # Widths /img resizes to, as in scripts/generate_images.py
+    PAGE_CACHE_SIZE=256,  # Rendered pages (and their gzip/brotli bodies) kept for conditional GET
+    PAGE_MAX_AGE=0,  # Browsers revalidate pages with If-None-Match on every visit
+    PAGE_CACHE_HOSTS=None,  # Hosts (host[:port]) pages are cached for (default: those of SITE_URL and PREWARM_BASE_URLS)
+    METRICS_ENABLED=True,  # Request timing, Server-Timing headers and /metrics
+    METRICS_DIR=None,  # Shared directory where each worker saves its metrics, so /metrics adds them all up
+    METRICS_WRITE_INTERVAL=5,  # Seconds between saves of a worker's metrics to METRICS_DIR
+    METRICS_TOKEN=None,  # Bearer token /metrics requires; without one it only answers local, unproxied requests
+    PROFILE_SLOWEST=0,  # Keep cProfile dumps of the N slowest requests in PROFILE_DIR (0 = off)
+    PROFILE_SAMPLE_RATE=1.0,  # Share of requests profiled while PROFILE_SLOWEST is on
+    PROFILE_DIR=os.path.join(CACHE_DIR, 'profiles'),
+    PREWARM_BASE_URLS=None,  # Hosts pages are pre-rendered for, as requests see them (default: SITE_URL)
+    PREWARM_WORKERS=2,  # Threads re-rendering pages after a content change
+    SEARCH_INDEX_PATH=os.path.join(CACHE_DIR, 'search-index.pickle'),  # Saved blog search index for fast restarts
+    RELATED_POSTS=4,  # Related posts listed under each blog post
+    RELATED_INDEX_PATH=os.path.join(CACHE_DIR, 'related-posts.pickle'),  # Saved TF-IDF vectors and neighbour table
     SITE_URL='https://krishnakumarsoni.com'  # Update with your actual domain
 )
 
+# DEBUG, template/content reloading and the secret key (used for flash messages)
+# depend on APP_ENV; any setting above can be overridden with FLASK_<NAME>
+load_config(app)
+
+# Latency histograms, Server-Timing headers and /metrics; first, so the timing covers the other hooks
+init_metrics(app)
+
+# Content-hashed static URLs, bundled stylesheets, responsive images and the sound effect sprite
+init_assets(app)
+init_css_bundles(app)
+init_images(app)
+init_audio(app)
+init_http_cache(app)
+
+# Parsed tracking/offerings configuration, reloaded when the files change
+init_configs(app)
+
+# Section pages (content/<section>/index.md), parsed once per file change
+sections = SectionStore(app.config['CONTENT_DIR'], check_interval=app.config['CONTENT_RELOAD_INTERVAL'])
+app.extensions['sections'] = sections
+
+@span('get_markdown_content')
 def get_markdown_content(directory, filename='index.md'):
     """Get content from markdown file"""
-    file_path = app.config['CONTENT_DIR'] / directory / filename
-    if not file_path.exists():
-        return None
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-        return markdown.markdown(content)
+    section = sections.get(directory, filename)
+    return section['html'] if section else None
 
 def get_section_content(section_name):
     """Get content for a specific section"""
@@ -34,60 +85,21 @@ def get_section_content(section_name):
 
 def get_metadata_from_markdown(directory, filename='index.md'):
     """Extract title and meta description from markdown content"""
-    file_path = app.config['CONTENT_DIR'] / directory / filename
-    if not file_path.exists():
+    section = sections.get(directory, filename)
+    if not section:
         return {"title": "", "description": ""}
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-        lines = content.split('\n')
-        title = lines[0].strip('# ') if lines and lines[0].startswith('#') else ""
-        
-        # Extract first paragraph for description
-        description = ""
-        for line in lines[1:]:
-            if line.strip() and not line.startswith('#'):
-                description = re.sub(r'[#*`_]', '', line).strip()
-                break
-                
-        return {"title": title, "description": description}
+    return {"title": section['title'], "description": section['description']}
 
 def get_offerings_data():
     """Get offerings data from markdown and structure it for the template"""
-    content = get_section_content('offerings')
-    if not content:
+    section = sections.get('offerings')
+    if not section or not section['html']:
         return {
             'product_development': [],
             'product_management': [],
             'training_workshops': []
         }
-    
-    # Parse the markdown content to extract offerings
-    # This assumes a specific structure in the markdown file
-    file_path = app.config['CONTENT_DIR'] / 'offerings' / 'index.md'
-    offerings = {
-        'product_development': [],
-        'product_management': [],
-        'training_workshops': []
-    }
-    
-    current_section = None
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            line = line.strip()
-            if line.startswith('## Product Development'):
-                current_section = 'product_development'
-            elif line.startswith('## Product Management'):
-                current_section = 'product_management'
-            elif line.startswith('## Training & Workshops'):
-                current_section = 'training_workshops'
-            elif line.startswith('- ') and current_section:
-                # Remove the '- ' and add to current section
-                offering = line[2:].strip()
-                offerings[current_section].append(offering)
-    
-    return offerings
+    return section['offerings']
 
 @app.route('/')
 def index():
@@ -115,19 +127,55 @@ def offerings():
 @app.route('/static/configurations/<path:filename>')
 def serve_configurations(filename):
     # Serve files from the configurations directory in static
+    name = app.extensions['configs'].by_filename(filename)
+    if name is not None:
+        try:
+            return app.extensions['configs'].response(name)
+        except Exception as e:
+            app.logger.error(f"Error loading {filename}: {str(e)}")
     return send_from_directory('static/configurations', filename)
 
 @app.route('/api/tracking-config')
+@span('tracking_config')
 def tracking_config():
     try:
-        config_path = os.path.join('static', 'configurations', 'tracking.yaml')
-        with open(config_path, 'r') as file:
-            config = yaml.safe_load(file)
-            return jsonify(config)
+        return app.extensions['configs'].response('tracking')
     except Exception as e:
         app.logger.error(f"Error loading tracking config: {str(e)}")
         return jsonify({"error": "Failed to load tracking configuration"}), 500
 
+@app.route('/img/<path:filename>')
+def resized_image(filename):
+    """Serve a resized/transcoded variant of an image under static/images"""
+    source = safe_join(os.path.join(app.static_folder, 'images'), filename)
+    if source is None or os.path.splitext(source)[1].lower() not in SOURCE_EXTENSIONS or not os.path.isfile(source):
+        abort(404)
+
+    # Only the variants image_url() links to are encoded, so clients can't make the server
+    # produce (and store) arbitrary sizes
+    fmt = request.args.get('fmt', 'webp').lower()
+    fmt = 'jpeg' if fmt == 'jpg' else fmt
+    width = request.args.get('w', max(app.config['IMAGE_WIDTHS']), type=int)
+    if fmt not in image_formats() or width not in app.config['IMAGE_WIDTHS']:
+        abort(400)
+    quality = QUALITY.get(fmt)
+
+    digest = app.extensions['assets'].digest(f'images/{filename}') or file_digest(source)
+    if request.args.get('v') != digest:
+        # Stale or missing source hash: send the client to the current version's URL
+        return redirect(url_for('resized_image', filename=filename, w=width, fmt=fmt, v=digest))
+    try:
+        path, etag = app.extensions['image_cache'].get(source, digest, width, fmt, quality)
+    except Exception as e:
+        app.logger.error(f"Error resizing image {filename}: {str(e)}")
+        return Response("Error resizing image", status=500)
+
+    # The URL carries the source hash, so it can never go stale
+    response = send_file(path, mimetype=MIME_TYPES[fmt], etag=etag, conditional=True, max_age=IMMUTABLE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
 @app.route('/solutions')
 def solutions():
     # Get metadata for SEO
@@ -159,48 +207,23 @@ def tools():
 
 @app.route('/sitemap.xml')
 def sitemap():
-    """Generate a sitemap.xml file"""
+    """Serve sitemap.xml, which becomes a sitemap index past 50,000 URLs"""
+    return sitemap_document('sitemap.xml')
+
+@app.route('/sitemap-<int:number>.xml')
+def sitemap_part(number):
+    """Serve one part of a split sitemap"""
+    return sitemap_document(f'sitemap-{number}.xml')
+
+def sitemap_document(name):
     try:
-        root = ET.Element('urlset')
-        root.set('xmlns', 'http://www.sitemaps.org/schemas/sitemap/0.9')
-        
-        # Add main pages
-        main_pages = ['', 'offerings', 'solutions', 'resume', 'tools', 'blogs']
-        for page in main_pages:
-            url = ET.SubElement(root, 'url')
-            loc = ET.SubElement(url, 'loc')
-            loc.text = f"{app.config['SITE_URL']}/{page}" if page else app.config['SITE_URL']
-            lastmod = ET.SubElement(url, 'lastmod')
-            lastmod.text = datetime.now().strftime('%Y-%m-%d')
-            changefreq = ET.SubElement(url, 'changefreq')
-            changefreq.text = 'weekly'
-            priority = ET.SubElement(url, 'priority')
-            priority.text = '1.0' if not page else '0.8'
-        
-        # Add blog posts
-        blog_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'content', 'blogs')
-        if os.path.exists(blog_folder):
-            blog_files = [f for f in os.listdir(blog_folder) if f.endswith('.md')]
-            for blog_file in blog_files:
-                slug = os.path.splitext(blog_file)[0]
-                url = ET.SubElement(root, 'url')
-                loc = ET.SubElement(url, 'loc')
-                loc.text = f"{app.config['SITE_URL']}/blog/{slug}"
-                lastmod = ET.SubElement(url, 'lastmod')
-                # Use file modification date
-                file_path = os.path.join(blog_folder, blog_file)
-                lastmod.text = datetime.fromtimestamp(os.path.getmtime(file_path)).strftime('%Y-%m-%d')
-                changefreq = ET.SubElement(url, 'changefreq')
-                changefreq.text = 'monthly'
-                priority = ET.SubElement(url, 'priority')
-                priority.text = '0.7'
-        
-        # Return XML content
-        xml_content = ET.tostring(root, encoding='utf-8')
-        return Response(xml_content, mimetype='application/xml')
+        response = app.extensions['sitemap'].response(name)
     except Exception as e:
         app.logger.error(f"Error generating sitemap: {str(e)}")
         return Response("Error generating sitemap", status=500)
+    if response is None:
+        abort(404)
+    return response
 
 @app.route('/robots.txt')
 def robots():
@@ -213,6 +236,13 @@ Sitemap: {app.config['SITE_URL']}/sitemap.xml
 
 # Initialize blog routes
 init_blog_routes(app)
+init_sitemap(app)
+init_feeds(app)
+init_search(app)
+init_related_posts(app)
+
+# Render pages into the page cache ahead of visitors and re-render them when files change
+init_prewarm(app)
 
 # Error handlers
 @app.errorhandler(404)
@@ -234,4 +264,4 @@ if __name__ == '__main__':
     if not os.path.exists(og_images_dir):
         os.makedirs(og_images_dir)
     
-    app.run(host='0.0.0.0', debug=True, port=8082) 
\ No newline at end of file
+    app.run(host='0.0.0.0', debug=app.config['DEBUG'], port=8082) 
\ No newline at end of file
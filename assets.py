@@ -0,0 +1,165 @@
+import hashlib
+import os
+import threading
+
+from flask import send_from_directory
+
+HASH_LENGTH = 10
+IMMUTABLE_MAX_AGE = 31536000  # One year, for content-hashed URLs
+
+
+def file_digest(path, length=HASH_LENGTH):
+    """Short content hash of a file"""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()[:length]
+
+
+def hashed_name(filename, digest):
+    """Insert a digest before the extension: css/base.css -> css/base.<digest>.css"""
+    root, ext = os.path.splitext(filename)
+    return f'{root}.{digest}{ext}'
+
+
+def iter_static_files(static_folder):
+    """Yield paths relative to static_folder (with forward slashes), skipping dotfiles"""
+    for dirpath, dirnames, filenames in os.walk(static_folder):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+        for name in sorted(filenames):
+            if name.startswith('.'):
+                continue
+            full = os.path.join(dirpath, name)
+            yield os.path.relpath(full, static_folder).replace(os.sep, '/')
+
+
+class AssetManifest:
+    """Content-hashed names for every file under a static folder.
+
+    Files are hashed on first lookup rather than all at startup, so a fresh
+    process only reads the assets the pages it serves refer to. With
+    ``auto_reload`` (debug mode) each lookup re-checks the file's mtime and
+    size so edited assets get a new hash without a restart.
+    """
+
+    def __init__(self, static_folder, auto_reload=False):
+        self.static_folder = static_folder
+        self.auto_reload = auto_reload
+        self._hashed = {}
+        self._sources = {}
+        self._stamps = {}
+        self._complete = False
+        self._lock = threading.Lock()
+
+    def _stat(self, rel):
+        st = os.stat(os.path.join(self.static_folder, rel))
+        return (st.st_mtime_ns, st.st_size)
+
+    def _hash(self, rel):
+        """(hashed name, stamp) of a static file, read from disk"""
+        stamp = self._stat(rel)
+        return hashed_name(rel, file_digest(os.path.join(self.static_folder, rel))), stamp
+
+    def _add(self, rel):
+        hashed, stamp = self._hash(rel)
+        old = self._hashed.get(rel)
+        if old is not None and old != hashed:
+            self._sources.pop(old, None)
+        self._hashed[rel] = hashed
+        self._sources[hashed] = rel
+        self._stamps[rel] = stamp
+        return hashed
+
+    def build(self):
+        """Hash every file under the static folder.
+
+        The new manifest is built aside and swapped in whole, so lookups and
+        hashed URLs served meanwhile keep resolving against the old one.
+        """
+        hashed_names, sources, stamps = {}, {}, {}
+        for rel in iter_static_files(self.static_folder):
+            try:
+                hashed, stamps[rel] = self._hash(rel)
+            except OSError:
+                continue  # Removed while walking
+            hashed_names[rel] = hashed
+            sources[hashed] = rel
+        with self._lock:
+            self._hashed, self._sources, self._stamps = hashed_names, sources, stamps
+            self._complete = True
+
+    def _is_static_file(self, filename):
+        """Whether a name is one iter_static_files() would list"""
+        parts = filename.split('/')
+        if any(not part or part.startswith('.') or part == '..' for part in parts):
+            return False
+        return os.path.isfile(os.path.join(self.static_folder, *parts))
+
+    def lookup(self, filename):
+        """Return the hashed name for a static file, or None if it isn't known"""
+        hashed = self._hashed.get(filename)
+        if hashed is not None and not self.auto_reload:
+            return hashed
+        if hashed is None and (self._complete and not self.auto_reload or not self._is_static_file(filename)):
+            return None
+        try:
+            stamp = self._stat(filename)
+        except OSError:
+            return None
+        if self._stamps.get(filename) != stamp:
+            with self._lock:
+                return self._add(filename)
+        return hashed
+
+    def digest(self, filename):
+        """Return just the content hash of a static file, or None"""
+        hashed = self.lookup(filename)
+        return os.path.splitext(hashed)[0].rsplit('.', 1)[1] if hashed else None
+
+    def resolve(self, hashed):
+        """Return the real file for a hashed name, or None"""
+        source = self._sources.get(hashed)
+        if source is None and not self._complete:
+            # Not looked up yet in this process: css/base.<digest>.css -> css/base.css
+            root, ext = os.path.splitext(hashed)
+            base, _, digest = root.rpartition('.')
+            if base and len(digest) == HASH_LENGTH and self.lookup(f'{base}{ext}') == hashed:
+                source = f'{base}{ext}'
+        return source
+
+    def mapping(self):
+        """Copy of the {filename: hashed name} manifest"""
+        if not self._complete:
+            self.build()
+        return dict(self._hashed)
+
+
+def init_assets(app):
+    """Emit content-hashed static URLs and serve them as immutable.
+
+    url_for('static', filename=...) returns the hashed name. Hashed URLs are
+    cached for a year; plain /static/ paths still work with a short max-age.
+    """
+    manifest = AssetManifest(app.static_folder, auto_reload=app.debug)
+    app.extensions['assets'] = manifest
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            hashed = manifest.lookup(values['filename'])
+            if hashed:
+                values['filename'] = hashed
+
+    def static(filename):
+        source = manifest.resolve(filename)
+        if source is not None:
+            response = send_from_directory(app.static_folder, source, max_age=IMMUTABLE_MAX_AGE)
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+            return response
+        return send_from_directory(app.static_folder, filename,
+                                   max_age=app.config.get('STATIC_MAX_AGE', 300))
+
+    app.view_functions['static'] = static
+    return manifest
@@ -0,0 +1,75 @@
+import json
+import os
+
+from flask import url_for
+
+# Sound name -> source file under static/assets, in sprite order
+SOUNDS = {
+    'bongo-c': 'Bongo2_trimmed.wav',
+    'bongo-v': 'Bongo3_trimmed.wav',
+    'bongo-b': 'Bongo4_trimmed.wav',
+    'bongo-n': 'Bongo1_trimmed.wav',
+    'snap': 'snap_trimmed.wav',
+}
+SPRITE_DIR = 'assets/sprite'  # Relative to static/
+
+
+class AudioSprite:
+    """Sound offsets written by scripts/build_audio_sprite.py.
+
+    A missing manifest means no sprite has been built, and each sound is
+    served from its own WAV file instead.
+    """
+
+    def __init__(self, path, auto_reload=False):
+        self.path = path
+        self.auto_reload = auto_reload
+        self._manifest = None
+        self._stamp = None
+        self.load()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def load(self):
+        stamp = self._stat()
+        manifest = None
+        if stamp is not None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        self._manifest, self._stamp = manifest, stamp
+
+    def get(self):
+        if self.auto_reload and self._stat() != self._stamp:
+            self.load()
+        return self._manifest
+
+
+def init_audio(app):
+    """Expose sound_sprite() to templates: sprite files and offsets for the page's sound effects"""
+    sprite = AudioSprite(os.path.join(app.static_folder, SPRITE_DIR, 'manifest.json'), auto_reload=app.debug)
+    app.extensions['audio'] = sprite
+
+    def sound_sprite():
+        """{'files': [{'url', 'type'}, ...], 'sounds': {name: {'start', 'duration'[, 'url']}}}.
+
+        Files are in order of preference (Opus, MP3, WAV), so the first one
+        the browser can play is used. Without a built sprite, files is empty
+        and each sound carries the URL of its own WAV file.
+        """
+        manifest = sprite.get()
+        if manifest is None:
+            return {'files': [],
+                    'sounds': {name: {'url': url_for('static', filename=f'assets/{source}'),
+                                      'start': 0, 'duration': None}
+                               for name, source in SOUNDS.items()}}
+        return {'files': [{'url': url_for('static', filename=f"{SPRITE_DIR}/{entry['file']}"),
+                           'type': entry['type']} for entry in manifest['files']],
+                'sounds': manifest['sounds']}
+
+    app.jinja_env.globals['sound_sprite'] = sound_sprite
+    return sprite
@@ -0,0 +1,92 @@
+"""Micro-benchmark for the blog post render path.
+
+Compares the previous per-request pipeline (markdown + BeautifulSoup for the
+excerpt, then markdown + BeautifulSoup again for heading IDs) with the
+single-pass render_post() and with an LRU cache hit.
+
+    python benchmarks/bench_render.py [--repeat 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import markdown
+from bs4 import BeautifulSoup
+
+from blog_render import render_post
+from caching import LRUCache
+
+BLOG_FOLDER = os.path.join(ROOT, 'content', 'blogs')
+
+
+def load_bodies():
+    """Return {slug: markdown body} with the metadata header stripped"""
+    bodies = {}
+    for filename in sorted(os.listdir(BLOG_FOLDER)):
+        if not filename.endswith('.md'):
+            continue
+        with open(os.path.join(BLOG_FOLDER, filename), 'r', encoding='utf-8') as f:
+            text = f.read()
+        header, _, body = text.partition('\n\n')
+        bodies[os.path.splitext(filename)[0]] = body.strip()
+    return bodies
+
+
+def legacy_render(content):
+    """The two-markdown, two-BeautifulSoup pipeline blog() used to run"""
+    soup = BeautifulSoup(markdown.markdown(content), 'html.parser')
+    excerpt = soup.p.text if soup.p else ""
+
+    soup = BeautifulSoup(markdown.markdown(content), 'html.parser')
+    toc = []
+    for i, heading in enumerate(soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])):
+        heading_id = f'heading-{i}'
+        heading['id'] = heading_id
+        toc.append({'text': heading.text, 'id': heading_id, 'level': int(heading.name[1])})
+    return {'content': str(soup), 'toc': toc, 'excerpt': excerpt}
+
+
+def cached_render(cache, slug, content):
+    key = (slug, 0)
+    rendered = cache.get(key)
+    if rendered is None:
+        rendered = render_post(content)
+        cache.put(key, rendered)
+    return rendered
+
+
+def bench(fn, bodies, repeat):
+    """Return mean milliseconds per render across all posts"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for slug, content in bodies.items():
+            fn(slug, content)
+    elapsed = time.perf_counter() - start
+    return elapsed * 1000 / (repeat * len(bodies))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    bodies = load_bodies()
+    cache = LRUCache(maxsize=len(bodies))
+    results = [
+        ('legacy (2x markdown + 2x bs4)', bench(lambda s, c: legacy_render(c), bodies, args.repeat)),
+        ('render_post (single pass)', bench(lambda s, c: render_post(c), bodies, args.repeat)),
+        ('render_post + LRU hit', bench(lambda s, c: cached_render(cache, s, c), bodies, args.repeat)),
+    ]
+
+    print(f"{len(bodies)} posts x {args.repeat} repeats")
+    baseline = results[0][1]
+    for name, ms in results:
+        print(f"{name:32} {ms:9.4f} ms/render  {baseline / ms:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,307 @@
+"""Benchmark every public route against synthetic content corpora.
+
+For each corpus size, generates that many blog posts (in the Title:/
+Subtitle:/Category:/Date: header format get_blog_metadata reads) next to
+copies of the real section pages, starts the app on it in a fresh process
+and requests every page from site_pages plus the JSON APIs. Each route is
+measured through the Flask test client ("client") and through a local
+threaded WSGI server over HTTP ("server"). Reports the first (cold)
+request, throughput, p50/p95/p99 latency and RSS per route, and writes
+everything to a JSON file that --compare can diff against a later run.
+
+    python benchmarks/bench_routes.py [--posts 10,1000,10000] [--modes client,server]
+        [--requests 200] [--concurrency 4] [--output results.json] [--compare old.json]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import resource
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from http.client import HTTPConnection
+from urllib.parse import urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CONTENT_DIR = os.path.join(ROOT, 'content')
+CORPUS_DIR = os.path.join(ROOT, '.cache', 'corpus')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+CATEGORIES = ['Career', 'News', 'Rebellion', 'Wanderings', 'Product']
+# Routes outside site_pages, with the endpoint they're reported under
+EXTRA_URLS = [
+    ('/blogs?page=2', 'blogs?page'),
+    ('/blogs?category=career', 'blogs?category'),
+    ('/api/blogs?limit=10', 'api_blogs'),
+    ('/api/search?q=product', 'api_search'),
+    ('/api/search?q=pro', 'api_search prefix'),
+]
+
+
+def load_words():
+    """Every word of the real posts, to give synthetic text a realistic distribution"""
+    words = []
+    folder = os.path.join(CONTENT_DIR, 'blogs')
+    for filename in sorted(os.listdir(folder)):
+        if filename.endswith('.md'):
+            with open(os.path.join(folder, filename), 'r', encoding='utf-8') as f:
+                _, _, body = f.read().partition('\n\n')
+            words += re.findall(r'[A-Za-z]+', body)
+    return words
+
+
+def synthetic_post(words, i, rng):
+    """Markdown for one post: header block, then 3-8 sections of paragraphs and lists"""
+    title = ' '.join(rng.choices(words, k=rng.randint(3, 8))).capitalize()
+    day = date(2018, 1, 1) + timedelta(days=rng.randrange(7 * 365))
+    lines = [
+        f'Title: {title}',
+        f"Subtitle: {' '.join(rng.choices(words, k=rng.randint(5, 12))).capitalize()}",
+        f'Category: {rng.choice(CATEGORIES)}',
+        f"Date: {day.strftime('%B %d, %Y')}",
+        '',
+    ]
+    for _ in range(rng.randint(3, 8)):
+        lines += [f"## {' '.join(rng.choices(words, k=rng.randint(2, 6))).capitalize()}", '']
+        for _ in range(rng.randint(1, 4)):
+            lines += [' '.join(rng.choices(words, k=rng.randint(40, 120))).capitalize() + '.', '']
+        if rng.random() < 0.3:
+            lines += [f"- **{rng.choice(words)}** {' '.join(rng.choices(words, k=8))}" for _ in range(4)]
+            lines.append('')
+    return f'post-{i:05d}', '\n'.join(lines)
+
+
+def generate_corpus(count, seed=1):
+    """Content directory with `count` synthetic posts; reused if it already exists"""
+    directory = os.path.join(CORPUS_DIR, f'{count}-{seed}')
+    marker = os.path.join(directory, '.complete')
+    if os.path.exists(marker):
+        return directory
+    shutil.rmtree(directory, ignore_errors=True)
+    for name in os.listdir(CONTENT_DIR):
+        if name != 'blogs' and os.path.isdir(os.path.join(CONTENT_DIR, name)):
+            shutil.copytree(os.path.join(CONTENT_DIR, name), os.path.join(directory, name))
+    blogs = os.path.join(directory, 'blogs')
+    os.makedirs(blogs)
+    rng = random.Random(seed)
+    words = load_words()
+    for i in range(count):
+        slug, text = synthetic_post(words, i, rng)
+        with open(os.path.join(blogs, f'{slug}.md'), 'w', encoding='utf-8') as f:
+            f.write(text)
+    open(marker, 'w').close()
+    return directory
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def rss_mb():
+    """Current resident set size, from /proc where available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return None
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+
+
+def route_groups(app, per_route):
+    """{name: (urls, expected status)}: site pages grouped by endpoint, sampled evenly"""
+    from site_pages import iter_site_pages
+
+    adapter = app.url_map.bind('localhost')
+    groups = {}
+    for page in iter_site_pages(app):
+        try:
+            endpoint = adapter.match(page['url'])[0]
+        except Exception:
+            endpoint = 'not_found'
+        urls, _ = groups.setdefault(endpoint, ([], page['status']))
+        urls.append(page['url'])
+    for name, (urls, status) in groups.items():
+        if len(urls) > per_route:
+            step = len(urls) / per_route
+            groups[name] = ([urls[int(i * step)] for i in range(per_route)], status)
+    has_page_two = app.extensions['blog_index'].page(2, app.config['BLOGS_PER_PAGE']) is not None
+    for url, name in EXTRA_URLS:
+        groups[name] = ([url], 404 if name == 'blogs?page' and not has_page_two else 200)
+    return groups
+
+
+def client_requester(app):
+    client = app.test_client()
+
+    def get(url):
+        # Requests carry the site's host, the only one pages are cached for
+        response = client.get(url, base_url=app.config['SITE_URL'])
+        response.get_data()
+        return response.status_code
+    return get, lambda: None
+
+
+def server_requester(app):
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # No access log line per request
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+    host = urlsplit(app.config['SITE_URL']).netloc
+
+    def get(url):
+        connection = HTTPConnection('127.0.0.1', port, timeout=30)
+        try:
+            connection.request('GET', url, headers={'Host': host, 'Accept-Encoding': 'gzip, br'})
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+    return get, server.shutdown
+
+
+def run_worker(args):
+    """Measure every route in this process and print the results as JSON"""
+    start = time.perf_counter()
+    from app import app
+    startup = time.perf_counter() - start
+    app.logger.disabled = True
+
+    get, stop = (server_requester if args.mode == 'server' else client_requester)(app)
+    posts = len(app.extensions['blog_index'].posts())
+    results = []
+    try:
+        for name, (urls, expected) in route_groups(app, args.per_route).items():
+            begin = time.perf_counter()
+            errors = int(get(urls[0]) != expected)
+            cold = time.perf_counter() - begin
+
+            def timed(i):
+                begin = time.perf_counter()
+                status = get(urls[i % len(urls)])
+                return time.perf_counter() - begin, status != expected
+
+            begin = time.perf_counter()
+            with ThreadPoolExecutor(args.concurrency if args.mode == 'server' else 1) as pool:
+                samples = list(pool.map(timed, range(args.requests)))
+            elapsed = time.perf_counter() - begin
+            latencies = [seconds * 1000 for seconds, _ in samples]
+            errors += sum(failed for _, failed in samples)
+            current_rss = rss_mb()
+            results.append({
+                'posts': posts,
+                'mode': args.mode,
+                'route': name,
+                'urls': len(urls),
+                'requests': args.requests,
+                'errors': errors,
+                'cold_ms': round(cold * 1000, 3),
+                'rps': round(args.requests / elapsed, 1),
+                'p50_ms': round(percentile(latencies, 50), 3),
+                'p95_ms': round(percentile(latencies, 95), 3),
+                'p99_ms': round(percentile(latencies, 99), 3),
+                'rss_mb': current_rss and round(current_rss, 1),
+                'peak_rss_mb': round(peak_rss_mb(), 1),
+                'startup_s': round(startup, 3),
+            })
+    finally:
+        stop()
+    json.dump(results, sys.stdout)
+
+
+def run_corpus(args, count, mode):
+    """Run one corpus size and mode in a fresh interpreter, so caches and RSS start clean"""
+    corpus = generate_corpus(count, args.seed)
+    env = dict(os.environ,
+               APP_ENV='production',
+               APP_SECRET='benchmark',
+               FLASK_CONTENT_DIR=corpus,
+               FLASK_CONTENT_SNAPSHOT_PATH=os.path.join(corpus, '.content-index.pickle'),
+               FLASK_SEARCH_INDEX_PATH=os.path.join(corpus, '.search-index.pickle'),
+               FLASK_RELATED_INDEX_PATH=os.path.join(corpus, '.related-posts.pickle'),
+               FLASK_METRICS_ENABLED='false',
+               FLASK_PREWARM_ENABLED='false')  # Measure rendering, not pre-rendered cache hits
+    if args.no_page_cache:
+        env['FLASK_PAGE_CACHE_SIZE'] = '0'
+    command = [sys.executable, os.path.abspath(__file__), '--worker', '--mode', mode,
+               '--requests', str(args.requests), '--concurrency', str(args.concurrency),
+               '--per-route', str(args.per_route)]
+    output = subprocess.run(command, env=env, cwd=ROOT, check=True, stdout=subprocess.PIPE).stdout
+    return json.loads(output)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results, baseline=None):
+    previous = {(r['posts'], r['mode'], r['route']): r for r in baseline or []}
+    for r in results:
+        line = (f"{r['posts']:>6} {r['mode']:6} {r['route']:20} cold {r['cold_ms']:9.2f} ms  "
+                f"{r['rps']:8.1f} req/s  p50 {r['p50_ms']:8.3f}  p95 {r['p95_ms']:8.3f}  "
+                f"p99 {r['p99_ms']:8.3f} ms  rss {r['rss_mb']} MB  errors {r['errors']}")
+        old = previous.get((r['posts'], r['mode'], r['route']))
+        if old:
+            line += f"  p50 {100 * (r['p50_ms'] / old['p50_ms'] - 1):+.0f}% p99 {100 * (r['p99_ms'] / old['p99_ms'] - 1):+.0f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', default='10,1000,10000', help='comma-separated corpus sizes')
+    parser.add_argument('--modes', default='client,server', help='client, server or both')
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per route')
+    parser.add_argument('--concurrency', type=int, default=4, help='parallel connections in server mode')
+    parser.add_argument('--per-route', type=int, default=20, help='distinct URLs sampled per route')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-page-cache', action='store_true', help='measure rendering, not cache hits')
+    parser.add_argument('--output', help=f'results file (default {os.path.relpath(RESULTS_DIR, ROOT)}/<commit>.json)')
+    parser.add_argument('--compare', help='earlier results file to show changes against')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args)
+
+    results = []
+    for count in (int(n) for n in args.posts.split(',')):
+        for mode in args.modes.split(','):
+            results += run_corpus(args, count, mode)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)['results']
+    print_results(results, baseline)
+
+    commit = git_commit()
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit or 'results'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({'commit': commit, 'python': sys.version.split()[0], 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'options': {k: v for k, v in vars(args).items() if k not in ('worker', 'mode')},
+                   'results': results}, f, indent=2)
+    print(f"Saved {output}")
+
+
+if __name__ == '__main__':
+    main()
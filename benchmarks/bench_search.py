@@ -0,0 +1,97 @@
+"""Benchmark blog search against a synthetic corpus.
+
+Builds a SearchIndex over --posts synthetic posts whose text is sampled from
+the real posts in content/blogs (so term frequencies look realistic), then
+reports build time, pickle size and load time, and query latency
+percentiles for whole-word, prefix (type-ahead) and two-word queries.
+
+    python benchmarks/bench_search.py [--posts 10000] [--queries 2000]
+"""
+import argparse
+import os
+import pickle
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from blog_search import SearchIndex, tokenize
+
+BLOG_FOLDER = os.path.join(ROOT, 'content', 'blogs')
+
+
+def load_words():
+    """Every token of the real posts, in order, duplicates included"""
+    words = []
+    for filename in sorted(os.listdir(BLOG_FOLDER)):
+        if filename.endswith('.md'):
+            with open(os.path.join(BLOG_FOLDER, filename), 'r', encoding='utf-8') as f:
+                words += tokenize(f.read())
+    return words
+
+
+def synthetic_posts(words, count, rng):
+    """Posts of 300-1500 words drawn from the real word distribution"""
+    for i in range(count):
+        body = rng.choices(words, k=rng.randint(300, 1500))
+        yield f'post-{i}', {
+            'title': ' '.join(rng.choices(words, k=rng.randint(4, 10))),
+            'subtitle': ' '.join(rng.choices(words, k=rng.randint(6, 14))),
+            'category': rng.choice(['career', 'news', 'rebellion', 'wanderings', 'product']),
+            'content': ' '.join(body),
+        }
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    words = load_words()
+    vocabulary = sorted(set(words))
+
+    index = SearchIndex()
+    start = time.perf_counter()
+    for slug, fields in synthetic_posts(words, args.posts, rng):
+        index.add(slug, fields, stamp=(0, 0))
+    build = time.perf_counter() - start
+
+    data = pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL)
+    start = time.perf_counter()
+    pickle.loads(data)
+    load = time.perf_counter() - start
+
+    print(f"{args.posts} posts, {len(vocabulary)} distinct terms")
+    print(f"build {build:.2f} s, pickle {len(data) / 1e6:.1f} MB, load {load * 1000:.0f} ms")
+
+    kinds = {
+        'word': lambda: rng.choice(words),
+        'prefix': lambda: rng.choice(vocabulary)[:rng.randint(2, 4)],
+        'two words': lambda: f'{rng.choice(words)} {rng.choice(words)}',
+    }
+    for kind, make_query in kinds.items():
+        queries = [make_query() for _ in range(args.queries)]
+        # Per-term weights are computed on first use and cached, like in a running server
+        for query in queries:
+            index.search(query)
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query)
+            samples.append((time.perf_counter() - start) * 1000)
+        print(f"{kind:10} p50 {percentile(samples, 50):7.3f} ms  p95 {percentile(samples, 95):7.3f} ms  "
+              f"p99 {percentile(samples, 99):7.3f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Benchmark cold start: import time and time to first response.
+
+For each corpus size (synthetic posts, as in bench_routes.py), runs fresh
+interpreters in two states: "cold", with no content snapshot or saved
+indexes, and "warm", reusing the files the cold runs wrote, as a
+scale-to-zero instance restarting from a built image would. Reports the
+`python -X importtime` total for `import app` with its slowest top-level
+imports, then, per route, the time to import the app, the time until the
+first response is complete, and the wall time of the whole process.
+
+    python benchmarks/bench_startup.py [--posts 10,1000] [--runs 5]
+        [--routes "/robots.txt,/,/blog/{post},/api/search?q=product"] [--output results.json]
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+from bench_routes import RESULTS_DIR, ROOT, generate_corpus, git_commit
+
+DEFAULT_ROUTES = '/robots.txt,/,/blog/{post},/api/search?q=product'
+
+
+def app_env(corpus):
+    """Environment for the app on a corpus, with its snapshot and indexes kept in one directory"""
+    cache = os.path.join(corpus, '.startup-cache')
+    return cache, dict(os.environ,
+                       APP_ENV='production',
+                       APP_SECRET='benchmark',
+                       FLASK_CONTENT_DIR=corpus,
+                       FLASK_CONTENT_SNAPSHOT_PATH=os.path.join(cache, 'content-index.pickle'),
+                       FLASK_SEARCH_INDEX_PATH=os.path.join(cache, 'search-index.pickle'),
+                       FLASK_RELATED_INDEX_PATH=os.path.join(cache, 'related-posts.pickle'),
+                       FLASK_METRICS_ENABLED='false',
+                       FLASK_PREWARM_ENABLED='false')
+
+
+def import_times(env):
+    """Cumulative `import app` time and its slowest direct imports, in ms"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], env=env, cwd=ROOT,
+                            check=True, capture_output=True, text=True).stderr
+    total, children = None, []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:
+            children.append((int(cumulative) / 1000, name.strip()))
+        elif depth == 0:
+            # Children are listed before their parent, so those collected since the last top-level line are its own
+            if name.strip() == 'app':
+                total = int(cumulative) / 1000
+                break
+            children = []
+    return total, sorted(children, reverse=True)[:5]
+
+
+def run_worker(args):
+    """Import the app and make one request; runs in a fresh interpreter"""
+    start = time.perf_counter()
+    from app import app
+    imported = time.perf_counter()
+    route = args.route
+    if '{post}' in route:
+        posts = app.extensions['blog_index'].posts()
+        route = route.replace('{post}', posts[0]['slug'] if posts else 'missing')
+    response = app.test_client().get(route, base_url=app.config['SITE_URL'])
+    response.get_data()
+    done = time.perf_counter()
+    json.dump({'status': response.status_code, 'import_ms': (imported - start) * 1000,
+               'first_response_ms': (done - start) * 1000}, sys.stdout)
+
+
+def run_route(env, route, runs, cache=None):
+    """Median timings of `runs` fresh processes; removes ``cache`` before each run when given"""
+    samples = []
+    for _ in range(runs):
+        if cache:
+            shutil.rmtree(cache, ignore_errors=True)
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', '--route', route],
+                                env=env, cwd=ROOT, check=True, stdout=subprocess.PIPE).stdout
+        wall = (time.perf_counter() - start) * 1000
+        samples.append(dict(json.loads(output), wall_ms=wall))
+    return {
+        'status': samples[-1]['status'],
+        **{key: round(statistics.median(s[key] for s in samples), 1)
+           for key in ('import_ms', 'first_response_ms', 'wall_ms')},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', default='10,1000', help='comma-separated corpus sizes')
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per route and state')
+    parser.add_argument('--routes', default=DEFAULT_ROUTES, help='comma-separated; {post} is the newest post')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help=f'results file (default {os.path.relpath(RESULTS_DIR, ROOT)}/startup-<commit>.json)')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--route', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return run_worker(args)
+
+    results = []
+    for count in (int(n) for n in args.posts.split(',')):
+        cache, env = app_env(generate_corpus(count, args.seed))
+        for state in ('cold', 'warm'):
+            if state == 'cold':
+                shutil.rmtree(cache, ignore_errors=True)
+            total, slowest = import_times(env)
+            print(f"{count:>6} {state:4} import app {total:8.1f} ms  slowest: "
+                  + ', '.join(f'{name} {ms:.1f}' for ms, name in slowest))
+            for route in args.routes.split(','):
+                # Cold runs each start without the snapshot; warm runs reuse what the last cold run saved
+                timing = run_route(env, route, args.runs, cache if state == 'cold' else None)
+                print(f"{count:>6} {state:4} {route:24} status {timing['status']}  import {timing['import_ms']:8.1f} ms  "
+                      f"first response {timing['first_response_ms']:8.1f} ms  process {timing['wall_ms']:8.1f} ms")
+                results.append({'posts': count, 'state': state, 'route': route, 'import_app_ms': total, **timing})
+            if state == 'cold':
+                # Leave a complete snapshot and saved indexes behind for the warm runs
+                run_route(env, '/blog/{post}', 1)
+                run_route(env, '/api/search?q=warm', 1)
+
+    commit = git_commit()
+    output = args.output or os.path.join(RESULTS_DIR, f"startup-{commit or 'results'}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump({'commit': commit, 'python': sys.version.split()[0], 'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'options': {k: v for k, v in vars(args).items() if k not in ('worker', 'route')},
+                   'results': results}, f, indent=2)
+    print(f"Saved {output}")
+
+
+if __name__ == '__main__':
+    main()
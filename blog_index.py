@@ -0,0 +1,325 @@
+import base64
+import bisect
+import hashlib
+import importlib.metadata
+import importlib.util
+import os
+import pickle
+import threading
+import time
+
+# Part of every snapshot key; bump to discard saved snapshots when snapshot_key() can't tell
+SNAPSHOT_FORMAT = 1
+
+
+def sort_key(post):
+    """Ascending key for newest-first order: by day descending, then slug.
+
+    date_iso is ISO formatted, so its first ten characters are the day.
+    """
+    return (-int(post['date_iso'][:10].replace('-', '')), post['slug'])
+
+
+def encode_cursor(post):
+    """Opaque pagination cursor pointing just after a post"""
+    return base64.urlsafe_b64encode(f"{post['date_iso'][:10]}|{post['slug']}".encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Sort key encoded in a cursor; raises ValueError if it is malformed"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        day, slug = raw.split('|', 1)
+        return (-int(day.replace('-', '')), slug)
+    except Exception as e:
+        raise ValueError(f'invalid cursor: {cursor!r}') from e
+
+
+def snapshot_key(modules=(), packages=()):
+    """Fingerprint of the code that parses posts, to key snapshots with.
+
+    Hashes SNAPSHOT_FORMAT, the source of each module in ``modules`` (found
+    without importing it) and the installed version of each distribution in
+    ``packages``. A deploy that changes how posts are parsed gets a new key,
+    so posts saved by the old code are re-parsed.
+    """
+    h = hashlib.sha256(f'{SNAPSHOT_FORMAT}\n'.encode())
+    for name in modules:
+        with open(importlib.util.find_spec(name).origin, 'rb') as f:
+            h.update(f.read())
+    for name in packages:
+        try:
+            version = importlib.metadata.version(name)
+        except importlib.metadata.PackageNotFoundError:
+            version = None
+        h.update(f'{name}=={version}\n'.encode())
+    return h.hexdigest()[:16]
+
+
+def read_generation(path):
+    """Stamp of a generation file; changes whenever bump_generation() replaces it"""
+    if not path:
+        return None
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def bump_generation(path):
+    """Increment the counter in a generation file, replacing the file so its stamp changes"""
+    try:
+        with open(path, 'r') as f:
+            generation = int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        generation = 0
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(f'{generation + 1}\n')
+    os.replace(tmp, path)
+
+
+class _View:
+    """Posts in newest-first order with their sort keys, for bisecting"""
+
+    def __init__(self, posts):
+        self.posts = posts
+        self.keys = [sort_key(post) for post in posts]
+
+
+class BlogIndex:
+    """In-memory index of blog posts keyed by slug.
+
+    Each markdown file is parsed once by ``loader`` and kept until its mtime
+    or size changes, so listing and reading posts is a dict lookup once the
+    index is warm. The folder is rescanned at most every ``check_interval``
+    seconds (0 means on every access), or right away when the
+    ``generation_path`` file changes, which is how a write in one worker
+    process reaches the others (see notify()).
+
+    Nothing is read until the first access. With a ``snapshot_path``,
+    parsed posts are saved there whenever they change and loaded back by
+    the first scan, so a new process only re-parses files whose stamp
+    differs from the snapshot. Snapshots saved under a different
+    ``snapshot_key`` (see snapshot_key()) are ignored.
+    """
+
+    def __init__(self, folder, loader, check_interval=0, logger=None, generation_path=None, snapshot_path=None,
+                 snapshot_key=None):
+        self.folder = folder
+        self.loader = loader
+        self.check_interval = check_interval
+        self.logger = logger
+        self.generation_path = generation_path
+        self.snapshot_path = snapshot_path
+        self.snapshot_key = snapshot_key if snapshot_key is not None else SNAPSHOT_FORMAT
+        self._generation = read_generation(generation_path)
+        self.version = 0
+        self._entries = {}
+        self._sorted = []
+        self._views = {}
+        self._facets = {'categories': [], 'years': []}
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _load_snapshot(self):
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, 'rb') as f:
+                snapshot = pickle.load(f)
+            if snapshot.get('key') == self.snapshot_key and snapshot.get('folder') == self.folder:
+                self._entries = snapshot['entries']
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f"Re-parsing posts, could not load {self.snapshot_path}: {str(e)}")
+
+    def _save_snapshot(self, entries):
+        if not self.snapshot_path:
+            return
+        tmp = f'{self.snapshot_path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_path) or '.', exist_ok=True)
+            with open(tmp, 'wb') as f:
+                pickle.dump({'key': self.snapshot_key, 'folder': self.folder, 'entries': entries}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.snapshot_path)
+        except OSError as e:
+            if self.logger:
+                self.logger.warning(f"Could not save post snapshot to {self.snapshot_path}: {str(e)}")
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _scan(self):
+        """Return {slug: (filename, stamp)} for every markdown file in the folder"""
+        found = {}
+        try:
+            with os.scandir(self.folder) as it:
+                for entry in it:
+                    if entry.name.endswith('.md') and entry.is_file():
+                        st = entry.stat()
+                        slug = os.path.splitext(entry.name)[0]
+                        found[slug] = (entry.name, (st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            pass
+        return found
+
+    def refresh(self, force=False):
+        """Re-parse posts whose file changed since the last scan"""
+        now = time.monotonic()
+        generation = read_generation(self.generation_path)
+        if generation != self._generation:
+            force = True
+        if not force and self._last_check and now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            if not force and self._last_check and now - self._last_check < self.check_interval:
+                return
+            if not self._last_check:
+                # First scan in this process, on first use rather than at import
+                self._load_snapshot()
+            self._generation = generation
+            found = self._scan()
+            entries = dict(self._entries)
+            changed = False
+
+            for slug in set(entries) - set(found):
+                del entries[slug]
+                changed = True
+
+            for slug, (filename, stamp) in found.items():
+                current = entries.get(slug)
+                if current and current['stamp'] == stamp:
+                    continue
+                try:
+                    post = self.loader(filename)
+                except Exception as e:
+                    if self.logger:
+                        self.logger.error(f"Error processing blog {filename}: {str(e)}")
+                    entries.pop(slug, None)
+                else:
+                    entries[slug] = {'stamp': stamp, 'post': post}
+                changed = True
+
+            # Views are also built on the first refresh, when every post came from the snapshot
+            if changed or not self.version:
+                self._sorted = sorted((e['post'] for e in entries.values()), key=sort_key)
+                self._views, self._facets = self._build_views(self._sorted)
+                self._entries = entries
+                self.version += 1
+            if changed:
+                self._save_snapshot(entries)
+            self._last_check = time.monotonic()
+
+    @staticmethod
+    def _build_views(posts):
+        """Sorted views of all posts and of each category and year bucket, plus facet counts"""
+        buckets = {None: posts}
+        names = {}
+        for post in posts:
+            category = post['category'].lower()
+            names.setdefault(category, post['category'])
+            buckets.setdefault(('category', category), []).append(post)
+            buckets.setdefault(('year', post['date_iso'][:4]), []).append(post)
+        facets = {
+            'categories': sorted((names[key[1]], len(bucket)) for key, bucket in buckets.items()
+                                 if key and key[0] == 'category'),
+            'years': sorted(((key[1], len(bucket)) for key, bucket in buckets.items()
+                             if key and key[0] == 'year'), reverse=True),
+        }
+        return {key: _View(bucket) for key, bucket in buckets.items()}, facets
+
+    def invalidate(self, slug=None):
+        """Force the next access to rescan the folder"""
+        with self._lock:
+            if slug in self._entries:
+                # Clear the stamp so the post is re-parsed even if mtime and size match
+                self._entries = dict(self._entries)
+                self._entries[slug] = dict(self._entries[slug], stamp=None)
+            self._last_check = 0.0
+
+    def notify(self, *slugs):
+        """Re-read these posts here and tell other processes to rescan.
+
+        Bumps the counter in the generation file with an atomic replace; every
+        process sharing the file rescans on its next access.
+        """
+        for slug in slugs:
+            self.invalidate(slug)
+        if self.generation_path:
+            bump_generation(self.generation_path)
+
+    def get(self, slug):
+        """Return the indexed post for a slug, or None"""
+        self.refresh()
+        entry = self._entries.get(slug)
+        return entry['post'] if entry else None
+
+    def stamp(self, slug):
+        """Return the (mtime_ns, size) the post was indexed at, or None"""
+        self.refresh()
+        entry = self._entries.get(slug)
+        return entry['stamp'] if entry else None
+
+    def posts(self):
+        """Return all posts sorted by date, newest first"""
+        self.refresh()
+        return self._sorted
+
+    def categories(self):
+        """(category, post count) pairs, alphabetically"""
+        self.refresh()
+        return self._facets['categories']
+
+    def years(self):
+        """(year, post count) pairs, newest first"""
+        self.refresh()
+        return self._facets['years']
+
+    def _view(self, category=None, year=None):
+        self.refresh()
+        views = self._views
+        if category and year:
+            by_category = views.get(('category', category.lower()))
+            by_year = views.get(('year', str(year)))
+            if by_category is None or by_year is None:
+                return _View([])
+            # Filter the smaller bucket by the other attribute
+            smaller, other = sorted((by_category, by_year), key=lambda v: len(v.posts))
+            members = {id(post) for post in other.posts}
+            return _View([post for post in smaller.posts if id(post) in members])
+        if category:
+            return views.get(('category', category.lower()), _View([]))
+        if year:
+            return views.get(('year', str(year)), _View([]))
+        return views.get(None, _View([]))
+
+    def page(self, number=1, per_page=10, category=None, year=None):
+        """One page of posts, newest first, optionally filtered by category and year.
+
+        Returns None if the page number is out of range.
+        """
+        view = self._view(category, year)
+        total = len(view.posts)
+        pages = max(1, -(-total // per_page))
+        if not 1 <= number <= pages:
+            return None
+        start = (number - 1) * per_page
+        return {
+            'posts': view.posts[start:start + per_page],
+            'page': number,
+            'pages': pages,
+            'total': total,
+            'offset': start,
+        }
+
+    def after(self, cursor=None, limit=10, category=None, year=None):
+        """Posts following a cursor, and the cursor for the next batch (None at the end)"""
+        view = self._view(category, year)
+        start = bisect.bisect_right(view.keys, decode_cursor(cursor)) if cursor else 0
+        posts = view.posts[start:start + limit]
+        more = start + limit < len(view.posts)
+        return posts, encode_cursor(posts[-1]) if posts and more else None
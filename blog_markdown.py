@@ -0,0 +1,62 @@
+import html
+
+import markdown
+from markdown.extensions import Extension
+from markdown.extensions.toc import stashedHTML2text, unescape
+from markdown.treeprocessors import Treeprocessor
+from markdown.util import AtomicString
+
+HEADING_TAGS = ('h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+METADATA_PREFIXES = ('title:', 'subtitle:', 'category:', 'thumbnail:', 'date:')
+
+
+def _element_text(el, md):
+    """Plain text of an element as a browser would show it"""
+    parts = []
+    for text in el.itertext():
+        if not isinstance(text, AtomicString):
+            # Swap stashed raw HTML and entities back in, minus their tags
+            text = unescape(stashedHTML2text(text, md, strip_entities=False))
+        parts.append(html.unescape(text))
+    return ''.join(parts)
+
+
+class BlogPostTreeprocessor(Treeprocessor):
+    """Assign heading IDs and collect the table of contents and excerpt in one pass"""
+
+    def run(self, root):
+        toc = []
+        excerpt = None
+        index = 0
+        for el in root.iter():
+            if el.tag == 'p' and excerpt is None:
+                excerpt = _element_text(el, self.md)
+            elif el.tag in HEADING_TAGS:
+                text = _element_text(el, self.md)
+                heading_id = f'heading-{index}'
+                index += 1
+                # Skip if it's a metadata heading
+                if text.lower().startswith(METADATA_PREFIXES):
+                    continue
+                el.set('id', heading_id)
+                toc.append({'text': text, 'id': heading_id, 'level': int(el.tag[1])})
+        self.md.blog_toc = toc
+        self.md.blog_excerpt = excerpt or ""
+
+
+class BlogPostExtension(Extension):
+    def extendMarkdown(self, md):
+        md.registerExtension(self)
+        self.md = md
+        self.reset()
+        # Run after inline patterns (priority 20), alongside where the toc extension sits
+        md.treeprocessors.register(BlogPostTreeprocessor(md), 'blog_post', 5)
+
+    def reset(self):
+        self.md.blog_toc = []
+        self.md.blog_excerpt = ""
+
+
+def new_markdown():
+    """Markdown instance with the blog extension; blog_render imports this module on first use"""
+    return markdown.Markdown(extensions=[BlogPostExtension()])
@@ -0,0 +1,25 @@
+import threading
+
+from metrics import span
+
+_local = threading.local()
+
+
+def _get_markdown():
+    """Markdown instances are not thread-safe, so keep one per thread"""
+    md = getattr(_local, 'md', None)
+    if md is None:
+        from blog_markdown import new_markdown
+        md = _local.md = new_markdown()
+    return md
+
+
+@span('render_post')
+def render_post(text):
+    """Render blog markdown to HTML, table of contents and excerpt with a single parse"""
+    md = _get_markdown()
+    try:
+        content = md.convert(text)
+        return {'content': content, 'toc': md.blog_toc, 'excerpt': md.blog_excerpt}
+    finally:
+        md.reset()
@@ -1,15 +1,20 @@
 import os
 from datetime import datetime
-from flask import render_template, request, redirect, url_for, flash, jsonify
-import markdown
-import frontmatter
-from werkzeug.utils import secure_filename
+from flask import render_template, request, redirect, url_for, flash, jsonify, abort
 import re
-from bs4 import BeautifulSoup
+from blog_index import BlogIndex, encode_cursor, snapshot_key
+from blog_store import ThumbnailProcessor, atomic_write, format_post, make_slug, read_header, slug_lock
+from blog_render import render_post
+from caching import LRUCache
+from http_cache import skip_page_cache
+from metrics import span
 
 def init_blog_routes(app):
-    BLOG_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'content', 'blogs')
-    UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'uploads')
+    BLOG_FOLDER = os.path.join(app.root_path, app.config['CONTENT_DIR'], 'blogs')
+    UPLOAD_FOLDER = os.path.join(app.static_folder, 'uploads')
+    
+    # Rendered HTML and TOC keyed by (slug, mtime_ns), so edits never hit a stale entry
+    render_cache = LRUCache(app.config.get('BLOG_RENDER_CACHE_SIZE', 128))
     
     def parse_date(date_str):
         """Parse date string into datetime object"""
@@ -17,13 +22,20 @@ def init_blog_routes(app):
             # Try parsing with ordinal indicator (e.g., "March 29th, 2024")
             date_str = date_str.replace('st,', ',').replace('nd,', ',').replace('rd,', ',').replace('th,', ',')
             return datetime.strptime(date_str.strip(), '%B %d, %Y')
+        except ValueError:
+            pass
+        try:
+            # ISO dates (e.g., "2024-03-12")
+            return datetime.strptime(date_str.strip(), '%Y-%m-%d')
         except ValueError:
             # If parsing fails, return current date
             return datetime.now()
 
+    @span('get_blog_metadata')
     def get_blog_metadata(filename):
         filepath = os.path.join(BLOG_FOLDER, filename)
         with open(filepath, 'r', encoding='utf-8') as f:
+            mtime_ns = os.fstat(f.fileno()).st_mtime_ns
             content = f.read()
             
         # Split content into metadata and body
@@ -53,9 +65,12 @@ def init_blog_routes(app):
         # Parse the date
         date_obj = parse_date(metadata['date'])
         
-        # Get the excerpt from the first paragraph of content
-        soup = BeautifulSoup(markdown.markdown(content), 'html.parser')
-        excerpt = soup.p.text if soup.p else ""
+        # Render once; the excerpt comes from the first paragraph and the HTML is
+        # cached for the post page
+        slug = os.path.splitext(filename)[0]
+        rendered = render_post(content)
+        excerpt = rendered['excerpt']
+        render_cache.put((slug, mtime_ns), {'content': rendered['content'], 'toc': rendered['toc']})
         
         # Generate keywords from content
         keywords = generate_keywords(metadata['title'], metadata['subtitle'], metadata['category'])
@@ -68,7 +83,7 @@ def init_blog_routes(app):
             'excerpt': excerpt,
             'category': metadata['category'],
             'content': content,
-            'slug': os.path.splitext(filename)[0],
+            'slug': slug,
             'keywords': keywords,
             'thumbnail': metadata.get('thumbnail')
         }
@@ -85,71 +100,92 @@ def init_blog_routes(app):
         # Return unique keywords
         return ', '.join(set(keywords[:10]))
     
-    def extract_headings(html_content):
-        """Extract headings from HTML content and generate table of contents."""
-        soup = BeautifulSoup(html_content, 'html.parser')
-        headings = soup.find_all(['h1', 'h2', 'h3', 'h4', 'h5', 'h6'])
-        toc = []
-        
-        for i, heading in enumerate(headings):
-            # Skip if it's a metadata heading
-            if any(heading.text.lower().startswith(meta.lower()) for meta in ['title:', 'subtitle:', 'category:', 'thumbnail:', 'date:']):
-                continue
-            
-            # Generate unique ID for the heading
-            heading_id = f'heading-{i}'
-            heading['id'] = heading_id
-            
-            # Get heading level
-            level = int(heading.name[1])
-            
-            # Add to table of contents
-            toc.append({
-                'text': heading.text,
-                'id': heading_id,
-                'level': level
-            })
-        
-        return toc, str(soup)
+    def get_rendered(slug, post):
+        """Get rendered HTML and table of contents for an indexed post"""
+        stamp = blog_index.stamp(slug)
+        key = (slug, stamp[0] if stamp else None)
+        rendered = render_cache.get(key)
+        if rendered is None:
+            result = render_post(post['content'])
+            rendered = {'content': result['content'], 'toc': result['toc']}
+            render_cache.put(key, rendered)
+        return rendered
+
+    blog_index = BlogIndex(BLOG_FOLDER, get_blog_metadata,
+                           check_interval=app.config.get('CONTENT_RELOAD_INTERVAL', 0),
+                           logger=app.logger,
+                           generation_path=app.config.get('CONTENT_GENERATION_FILE'),
+                           snapshot_path=app.config.get('CONTENT_SNAPSHOT_PATH'),
+                           # Parsed posts depend on this module's loader and the markdown rendering it calls
+                           snapshot_key=snapshot_key(['blog_index', 'blog_routes', 'blog_render', 'blog_markdown'],
+                                                     ['Markdown', 'PyYAML']))
+    app.extensions['blog_index'] = blog_index
+
+    # Uploaded thumbnails are resized and encoded off the request thread
+    thumbnails = ThumbnailProcessor(UPLOAD_FOLDER, '/static/uploads', logger=app.logger)
+
+    def listing_filters():
+        category = request.args.get('category', '').strip().lower() or None
+        year = request.args.get('year', '').strip() or None
+        return category, year
 
     def blogs():
-        # Get all markdown files from the blogs folder
-        blog_files = [f for f in os.listdir(BLOG_FOLDER) if f.endswith('.md')]
-        blogs = []
-        
-        for filename in blog_files:
-            try:
-                blogs.append(get_blog_metadata(filename))
-            except Exception as e:
-                app.logger.error(f"Error processing blog {filename}: {str(e)}")
-                continue
-            
-        # Sort blogs by date, newest first
-        blogs.sort(key=lambda x: datetime.strptime(x['date'], '%B %d, %Y'), reverse=True)
-        
+        category, year = listing_filters()
+        listing = blog_index.page(request.args.get('page', 1, type=int),
+                                  app.config.get('BLOGS_PER_PAGE', 10), category, year)
+        if listing is None:
+            abort(404)
+        # Only one cached copy per real listing: not for filters matching nothing or spellings like ?page=01
+        if ((category or year) and not listing['total']
+                or request.args.get('page', '1') != str(listing['page'])
+                or request.args.get('category', category or '') != (category or '')
+                or request.args.get('year', year or '') != (year or '')):
+            skip_page_cache()
+        posts = listing['posts']
+        next_cursor = encode_cursor(posts[-1]) if posts and listing['page'] < listing['pages'] else None
         return render_template('pages/blogs.html', 
-                             blogs=blogs,
+                             blogs=posts,
+                             listing=listing,
+                             categories=blog_index.categories(),
+                             years=blog_index.years(),
+                             category=category,
+                             year=year,
+                             next_cursor=next_cursor,
                              meta_title="Blog | Krishna Kumar Soni",
                              meta_description="Read articles on product development, management, and technical solutions by Krishna Kumar Soni.",
                              meta_keywords="blogs, articles, product development, product management, tech insights",
                              is_local=request.host.startswith('127.0.0.1') or request.host.startswith('localhost'))
 
+    def api_blogs():
+        """Posts after a cursor, newest first, for lazy-loading the listing"""
+        category, year = listing_filters()
+        limit = min(max(request.args.get('limit', app.config.get('BLOGS_PER_PAGE', 10), type=int), 1), 50)
+        try:
+            posts, next_cursor = blog_index.after(request.args.get('cursor') or None, limit, category, year)
+        except ValueError:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        return jsonify({
+            'posts': [{
+                'slug': post['slug'],
+                'url': url_for('blog', slug=post['slug']),
+                'title': post['title'],
+                'subtitle': post['subtitle'],
+                'category': post['category'],
+                'date': post['date'],
+                'date_iso': post['date_iso'],
+                'excerpt': post['excerpt'],
+                'thumbnail': post['thumbnail'],
+            } for post in posts],
+            'next_cursor': next_cursor,
+        })
+
     def blog(slug):
-        filepath = os.path.join(BLOG_FOLDER, f'{slug}.md')
-        if not os.path.exists(filepath):
+        post = blog_index.get(slug)
+        if post is None:
             return redirect(url_for('blogs'))
             
-        # Get blog metadata and content
-        blog_data = get_blog_metadata(f'{slug}.md')
-        
-        # Convert markdown content to HTML
-        html_content = markdown.markdown(blog_data['content'])
-        
-        # Extract headings for table of contents and update HTML
-        toc, html_content = extract_headings(html_content)
-        
-        blog_data['content'] = html_content
-        blog_data['toc'] = toc
+        # Indexed posts are shared between requests, so work on a copy
+        blog_data = dict(post, **get_rendered(slug, post))
         
         # Structured data
         blog_json_ld = {
@@ -171,6 +207,7 @@ def init_blog_routes(app):
         
         return render_template('pages/blog.html', 
                              blog=blog_data,
+                             related_posts=app.extensions['related_posts'].related(slug),
                              meta_title=f"{blog_data['title']} | Krishna Kumar Soni Blog",
                              meta_description=blog_data['excerpt'],
                              meta_keywords=blog_data['keywords'],
@@ -180,96 +217,98 @@ def init_blog_routes(app):
     def add_blog():
         if not (request.host.startswith('127.0.0.1') or request.host.startswith('localhost')):
             return redirect(url_for('blogs'))
-            
-        title = request.form.get('title')
-        category = request.form.get('category')
-        content = request.form.get('content')
-        thumbnail = request.files.get('thumbnail')
-        
-        if not all([title, category, content]):
+
+        title = request.form.get('title', '').strip()
+        subtitle = request.form.get('subtitle', '').strip()
+        category = request.form.get('category', '').strip()
+        content = request.form.get('content', '')
+        thumbnail = request.form.get('thumbnail', '').strip()
+        thumbnail_file = request.files.get('thumbnail_file')
+
+        if not all([title, category, content.strip()]):
             flash('All fields are required')
             return redirect(url_for('blogs'))
-            
+
         # Create slug from title
-        slug = '-'.join(title.lower().split())
-        
-        # Save the markdown file
+        slug = make_slug(title)
         filepath = os.path.join(BLOG_FOLDER, f'{slug}.md')
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(f'{title}\n')
-            f.write(f'{datetime.now().strftime("%B %d, %Y")}\n\n')
-            f.write(content)
-            
-        # Save thumbnail if provided
-        if thumbnail:
-            filename = secure_filename(f'{slug}.jpg')
-            thumbnail.save(os.path.join(UPLOAD_FOLDER, filename))
-            
+
+        try:
+            with slug_lock(app.config['BLOG_LOCK_DIR'], slug):
+                if os.path.exists(filepath):
+                    flash('A blog post with this title already exists')
+                    return redirect(url_for('blogs'))
+
+                # Thumbnails are resized and encoded in the background; the URL is known up front
+                if thumbnail_file and thumbnail_file.filename:
+                    thumbnail = thumbnails.submit(slug, thumbnail_file.read())
+
+                atomic_write(filepath, format_post(title, subtitle, category,
+                                                   datetime.now().strftime('%B %d, %Y'), content, thumbnail))
+            blog_index.notify(slug)
+        except Exception as e:
+            app.logger.error(f"Error adding blog: {str(e)}")
+            flash('Error adding blog')
+
         return redirect(url_for('blogs'))
 
     def edit_blog():
         if not (request.host.startswith('127.0.0.1') or request.host.startswith('localhost')):
             return redirect(url_for('blogs'))
-            
-        slug = request.form.get('slug')
-        title = request.form.get('title')
-        category = request.form.get('category')
-        content = request.form.get('content')
-        thumbnail = request.files.get('thumbnail')
-        
-        if not all([slug, title, category, content]):
+
+        slug = request.form.get('slug', '')
+        title = request.form.get('title', '').strip()
+        subtitle = request.form.get('subtitle', '').strip()
+        category = request.form.get('category', '').strip()
+        content = request.form.get('content', '')
+        thumbnail = request.form.get('thumbnail', '').strip()
+        thumbnail_file = request.files.get('thumbnail_file')
+
+        if not all([slug, title, category, content.strip()]):
             flash('All fields are required')
             return redirect(url_for('blogs'))
-            
-        # Get the original file to preserve the date
-        filepath = os.path.join(BLOG_FOLDER, f'{slug}.md')
-        if not os.path.exists(filepath):
+
+        # Only indexed posts can be edited, which also keeps the slug inside BLOG_FOLDER
+        if blog_index.get(slug) is None:
             flash('Blog post not found')
             return redirect(url_for('blogs'))
-            
+
+        # Create new slug from category and title
+        new_slug = f'{make_slug(category)}-{make_slug(title)}'
+        filepath = os.path.join(BLOG_FOLDER, f'{slug}.md')
+        new_filepath = os.path.join(BLOG_FOLDER, f'{new_slug}.md')
+
         try:
-            # Read the original date
-            with open(filepath, 'r', encoding='utf-8') as f:
-                lines = f.read().split('\n')
-                original_date = lines[1] if len(lines) > 1 else datetime.now().strftime('%B %d, %Y')
-            
-            # Create new slug from category and title
-            title_slug = '-'.join(title.lower().split())
-            category_slug = '-'.join(category.lower().split())
-            new_slug = f'{category_slug}-{title_slug}'
-            new_filepath = os.path.join(BLOG_FOLDER, f'{new_slug}.md')
-            
-            # Check if new path would overwrite a different existing file
-            if new_filepath != filepath and os.path.exists(new_filepath):
-                flash('A blog post with this title already exists')
-                return redirect(url_for('blogs'))
-            
-            # Save the updated markdown file
-            with open(new_filepath, 'w', encoding='utf-8') as f:
-                f.write(f'{title}\n')
-                f.write(f'{original_date}\n\n')
-                f.write(content)
-            
-            # If filename changed, handle file moves
-            if new_filepath != filepath:
-                # Remove old markdown file
-                os.remove(filepath)
-                
-                # Handle thumbnail rename
-                old_thumb = os.path.join(UPLOAD_FOLDER, f'{slug}.jpg')
-                new_thumb = os.path.join(UPLOAD_FOLDER, f'{new_slug}.jpg')
-                if os.path.exists(old_thumb):
-                    os.rename(old_thumb, new_thumb)
-            
-            # Handle new thumbnail upload
-            if thumbnail:
-                filename = secure_filename(f'{new_slug}.jpg')
-                thumbnail_path = os.path.join(UPLOAD_FOLDER, filename)
-                thumbnail.save(thumbnail_path)
-            
+            with slug_lock(app.config['BLOG_LOCK_DIR'], slug, new_slug):
+                if not os.path.exists(filepath):
+                    flash('Blog post not found')
+                    return redirect(url_for('blogs'))
+
+                # Check if new path would overwrite a different existing file
+                if new_filepath != filepath and os.path.exists(new_filepath):
+                    flash('A blog post with this title already exists')
+                    return redirect(url_for('blogs'))
+
+                # Keep the original publication date
+                original_date = read_header(filepath).get('Date') or datetime.now().strftime('%B %d, %Y')
+
+                if thumbnail_file and thumbnail_file.filename:
+                    thumbnail = thumbnails.submit(new_slug, thumbnail_file.read())
+                elif new_filepath != filepath and thumbnail.endswith(f'/{thumbnails.filename(slug)}'):
+                    # A processed thumbnail follows its post to the new slug
+                    thumbnail = thumbnails.rename(slug, new_slug) or thumbnail
+
+                # Write the new file in one step before removing the old one, so the
+                # post is always readable under at least one of its names
+                atomic_write(new_filepath, format_post(title, subtitle, category, original_date,
+                                                       content, thumbnail))
+                if new_filepath != filepath:
+                    os.remove(filepath)
+
+            blog_index.notify(slug, new_slug)
             flash('Blog updated successfully')
             return redirect(url_for('blogs'))
-            
+
         except Exception as e:
             app.logger.error(f"Error updating blog: {str(e)}")
             flash('Error updating blog')
@@ -277,6 +316,7 @@ def init_blog_routes(app):
 
     # Register routes after all functions are defined
     app.add_url_rule('/blogs', 'blogs', blogs)
+    app.add_url_rule('/api/blogs', 'api_blogs', api_blogs)
     app.add_url_rule('/blog/<slug>', 'blog', blog)
     app.add_url_rule('/add_blog', 'add_blog', add_blog, methods=['POST'])
     app.add_url_rule('/edit_blog', 'edit_blog', edit_blog, methods=['POST']) 
\ No newline at end of file
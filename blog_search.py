@@ -0,0 +1,342 @@
+import bisect
+import heapq
+import math
+import os
+import pickle
+import re
+import sys
+import threading
+from array import array
+from collections import Counter
+
+from flask import jsonify, request, url_for
+
+TOKEN_RE = re.compile(r'\w+')
+LINK_TARGET_RE = re.compile(r'\]\([^)]*\)|https?://\S+')
+# Weighted term frequency per field, so title matches outrank body matches
+FIELD_WEIGHTS = (('title', 3), ('subtitle', 2), ('category', 2), ('content', 1))
+STOP_WORDS = {'the', 'is', 'and', 'to', 'a', 'in', 'that', 'of', 'i', 'it', 'for', 'with',
+              'on', 'as', 'are', 'be', 'this', 'an', 'or', 'at', 'by', 'was', 'you', 'we'}
+K1 = 1.2
+B = 0.75
+MIN_PREFIX = 2  # Shorter trailing tokens only match whole terms
+MAX_PREFIX_TERMS = 10  # Most common expansions kept for a prefix
+INDEX_FORMAT = 1
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOP_WORDS]
+
+
+class SearchIndex:
+    """In-memory inverted index with BM25 ranking and prefix matching.
+
+    Postings are a pair of arrays per term (document ids and weighted term
+    frequencies). Documents are keyed by slug and can be added or replaced
+    one at a time; each keeps the stamp it was indexed at so callers can
+    skip unchanged documents.
+    """
+
+    def __init__(self):
+        self._postings = {}  # term -> (array of doc ids, array of weighted term frequencies)
+        self._doc_len = array('I')
+        self._doc_terms = []  # doc id -> terms, for removal; None once removed
+        self._slugs = []  # doc id -> slug
+        self._docs = {}  # slug -> (doc id, stamp)
+        self._free = []
+        self._total_len = 0
+        self._vocabulary = None  # sorted terms for prefix lookups, rebuilt lazily
+        self._weights = {}  # term -> precomputed BM25 weights, see _term_weights()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def stamp(self, slug):
+        doc = self._docs.get(slug)
+        return doc[1] if doc else None
+
+    def slugs(self):
+        return list(self._docs)
+
+    def _changed(self, vocabulary):
+        self._weights = {}
+        if vocabulary:
+            self._vocabulary = None
+
+    def remove(self, slug):
+        with self._lock:
+            doc = self._docs.pop(slug, None)
+            if doc is None:
+                return
+            doc_id = doc[0]
+            vocabulary = False
+            for term in self._doc_terms[doc_id]:
+                ids, tfs = self._postings[term]
+                i = ids.index(doc_id)
+                del ids[i], tfs[i]
+                if not ids:
+                    del self._postings[term]
+                    vocabulary = True
+            self._total_len -= self._doc_len[doc_id]
+            self._doc_len[doc_id] = 0
+            self._doc_terms[doc_id] = None
+            self._slugs[doc_id] = None
+            self._free.append(doc_id)
+            self._changed(vocabulary)
+
+    def add(self, slug, fields, stamp=None):
+        """Index (or re-index) a document from a dict of field texts"""
+        counts = Counter()
+        for field, weight in FIELD_WEIGHTS:
+            for token in tokenize(LINK_TARGET_RE.sub(' ', fields.get(field) or '')):
+                counts[token] += weight
+
+        with self._lock:
+            self.remove(slug)
+            if self._free:
+                doc_id = self._free.pop()
+            else:
+                doc_id = len(self._slugs)
+                self._slugs.append(None)
+                self._doc_terms.append(None)
+                self._doc_len.append(0)
+            length = sum(counts.values())
+            vocabulary = False
+            for term, tf in counts.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[sys.intern(term)] = (array('I'), array('H'))
+                    vocabulary = True
+                ids, tfs = postings
+                # Postings stay sorted by doc id so lookups can bisect
+                i = len(ids) if not ids or ids[-1] < doc_id else bisect.bisect_left(ids, doc_id)
+                ids.insert(i, doc_id)
+                tfs.insert(i, min(tf, 0xFFFF))
+            self._slugs[doc_id] = slug
+            # Share one string per term with the postings keys; keeps the pickle small
+            self._doc_terms[doc_id] = tuple(sys.intern(term) for term in counts)
+            self._doc_len[doc_id] = length
+            self._total_len += length
+            self._docs[slug] = (doc_id, stamp)
+            self._changed(vocabulary)
+
+    def _expand(self, token, prefix):
+        """Terms a query token matches: itself, or every term it's a prefix of"""
+        if not prefix or len(token) < MIN_PREFIX:
+            return [token] if token in self._postings else []
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self._postings)
+        vocabulary = self._vocabulary
+        start = bisect.bisect_left(vocabulary, token)
+        end = bisect.bisect_left(vocabulary, token + '\uffff', start)
+        terms = vocabulary[start:end]
+        if len(terms) > MAX_PREFIX_TERMS:
+            terms = heapq.nlargest(MAX_PREFIX_TERMS, terms, key=lambda t: len(self._postings[t][0]))
+        return terms
+
+    def _term_weights(self, term):
+        """BM25 contribution of a term for each document in its postings.
+
+        Returns (weights by doc id order, (weight, doc id) pairs best first,
+        best weight). Cached until the index changes.
+        """
+        cached = self._weights.get(term)
+        if cached is None:
+            ids, tfs = self._postings[term]
+            n = len(self._docs)
+            avg_len = self._total_len / n
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            doc_len = self._doc_len
+            weights = array('d', (idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * doc_len[d] / avg_len))
+                                  for d, tf in zip(ids, tfs)))
+            ranked = sorted(zip(weights, ids), reverse=True)
+            cached = self._weights[term] = (weights, ranked, ranked[0][0])
+        return cached
+
+    def _weight(self, term, doc_id):
+        ids = self._postings[term][0]
+        i = bisect.bisect_left(ids, doc_id)
+        if i < len(ids) and ids[i] == doc_id:
+            return self._term_weights(term)[0][i]
+        return 0.0
+
+    def _ranked(self, terms):
+        """(weight, doc id) best first across a token's terms, each document once at its best weight"""
+        if len(terms) == 1:
+            yield from self._term_weights(terms[0])[1]
+            return
+        seen = set()
+        for weight, doc_id in heapq.merge(*(self._term_weights(t)[1] for t in terms), reverse=True):
+            if doc_id not in seen:
+                seen.add(doc_id)
+                yield weight, doc_id
+
+    def search(self, query, limit=10):
+        """Return [(slug, score)] best first.
+
+        Every query token must match; the last one also matches as a prefix
+        unless the query ends with whitespace, for type-ahead.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with self._lock:
+            if not self._docs:
+                return []
+            groups = []
+            for i, token in enumerate(tokens):
+                terms = self._expand(token, i == len(tokens) - 1 and not query[-1].isspace())
+                if not terms:
+                    return []
+                groups.append(terms)
+
+            # Threshold algorithm: read every token's documents best first in
+            # turn, scoring each new document fully by lookup. Stop once the
+            # top k can't be beaten by an unseen document (whose score is at
+            # most the sum of the current positions), or when one token has no
+            # documents left, since unseen documents then can't match it.
+            streams = [self._ranked(terms) for terms in groups]
+            frontier = [max(self._term_weights(t)[2] for t in terms) for terms in groups]
+            seen = set()
+            top = []
+            while not (len(top) == limit and top[0][0] >= sum(frontier)):
+                for i, stream in enumerate(streams):
+                    item = next(stream, None)
+                    if item is None:
+                        streams = None
+                        break
+                    frontier[i], doc_id = item
+                    if doc_id in seen:
+                        continue
+                    seen.add(doc_id)
+                    score = 0.0
+                    for j, terms in enumerate(groups):
+                        best = frontier[i] if j == i else max(self._weight(t, doc_id) for t in terms)
+                        if not best:
+                            break
+                        score += best
+                    else:
+                        if len(top) < limit:
+                            heapq.heappush(top, (score, doc_id))
+                        elif score > top[0][0]:
+                            heapq.heapreplace(top, (score, doc_id))
+                if streams is None:
+                    break
+            return [(self._slugs[doc_id], score) for score, doc_id in sorted(top, reverse=True)]
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock'], state['_vocabulary'], state['_weights']
+        return dict(state, format=INDEX_FORMAT)
+
+    def __setstate__(self, state):
+        if state.pop('format', None) != INDEX_FORMAT:
+            raise ValueError('unsupported search index format')
+        self.__dict__.update(state, _lock=threading.RLock(), _vocabulary=None, _weights={})
+
+
+class BlogSearch:
+    """Search index over the blog index, persisted between runs.
+
+    The first sync() loads the pickled index from ``path`` when there is
+    one, then re-indexes only posts whose file stamp changed. Later calls to sync() do the same
+    whenever the blog index version moves (posts added, edited or removed).
+    """
+
+    def __init__(self, blog_index, path=None, logger=None):
+        self.blog_index = blog_index
+        self.path = path
+        self.logger = logger
+        self.index = None  # Loaded by the first sync()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, 'rb') as f:
+                    return pickle.load(f)
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"Rebuilding search index, could not load {self.path}: {str(e)}")
+        return SearchIndex()
+
+    def save(self):
+        if not self.path:
+            return
+        # Every worker saves after the same change, so each writes its own temporary file
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(tmp, 'wb') as f:
+                pickle.dump(self.index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            if self.logger:
+                self.logger.warning(f"Could not save search index to {self.path}: {str(e)}")
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def sync(self):
+        """Bring the index up to date with the blog index; True if anything changed"""
+        posts = self.blog_index.posts()
+        if self.blog_index.version == self._version:
+            return False
+        with self._lock:
+            version = self.blog_index.version
+            if version == self._version:
+                return False
+            if self.index is None:
+                self.index = self._load()
+            changed = False
+            live = set()
+            for post in posts:
+                slug = post['slug']
+                live.add(slug)
+                stamp = self.blog_index.stamp(slug)
+                if stamp is None or stamp != self.index.stamp(slug):
+                    self.index.add(slug, post, stamp)
+                    changed = True
+            for slug in set(self.index.slugs()) - live:
+                self.index.remove(slug)
+                changed = True
+            if changed:
+                self.save()  # Under the lock, so no other sync changes the index or saves meanwhile
+            self._version = version
+        return changed
+
+    def search(self, query, limit=10):
+        """Posts matching a query, best first"""
+        self.sync()
+        results = []
+        for slug, score in self.index.search(query, limit):
+            post = self.blog_index.get(slug)
+            if post is not None:
+                results.append((post, score))
+        return results
+
+
+def init_search(app):
+    """Serve /api/search?q=; the index is loaded or built by the first search"""
+    search = BlogSearch(app.extensions['blog_index'], app.config.get('SEARCH_INDEX_PATH'), app.logger)
+    app.extensions['blog_search'] = search
+
+    @app.route('/api/search')
+    def search_posts():
+        query = request.args.get('q', '').strip()
+        limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+        results = [{
+            'slug': post['slug'],
+            'url': url_for('blog', slug=post['slug']),
+            'title': post['title'],
+            'subtitle': post['subtitle'],
+            'category': post['category'],
+            'date': post['date'],
+            'excerpt': post['excerpt'],
+            'score': round(score, 4),
+        } for post, score in search.search(request.args.get('q', ''), limit)]
+        return jsonify({'query': query, 'results': results})
+
+    return search
@@ -0,0 +1,134 @@
+import contextlib
+import io
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from images import QUALITY, encode_image, image_formats
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only cover threads of this process
+    fcntl = None
+
+HEADER_FIELDS = ('Title', 'Subtitle', 'Category', 'Thumbnail', 'Date')
+THUMBNAIL_WIDTH = 1200
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def make_slug(text):
+    """Lower-case, hyphen-separated slug that is safe to use as a file name"""
+    return re.sub(r'[^\w-]+', '', '-'.join(text.lower().split())).strip('-_') or 'post'
+
+
+def format_post(title, subtitle, category, date, content, thumbnail=None):
+    """Markdown file text in the header format get_blog_metadata reads"""
+    lines = [f'Title: {title}', f'Subtitle: {subtitle or ""}', f'Category: {category}']
+    if thumbnail:
+        lines.append(f'Thumbnail: {thumbnail}')
+    lines.append(f'Date: {date}')
+    return '\n'.join(lines) + '\n\n' + content.strip() + '\n'
+
+
+def read_header(path):
+    """Header fields of a post file, e.g. {'Title': ..., 'Date': ...}"""
+    header = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                break
+            name, sep, value = line.partition(': ')
+            if sep and name in HEADER_FIELDS:
+                header[name] = value.strip()
+    return header
+
+
+def atomic_write(path, data):
+    """Replace a file in one step, so readers see the old or the new version, never a partial one"""
+    directory, name = os.path.split(path)
+    # The temporary name doesn't end in .md, so the blog index never picks it up
+    tmp = os.path.join(directory, f'.{name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    mode = 'wb' if isinstance(data, bytes) else 'w'
+    try:
+        with open(tmp, mode, **({} if mode == 'wb' else {'encoding': 'utf-8', 'newline': ''})) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp)
+        raise
+
+
+@contextlib.contextmanager
+def slug_lock(lock_dir, *slugs):
+    """Hold an exclusive lock on each slug, across threads and worker processes.
+
+    Slugs are locked in sorted order so two writers touching the same pair
+    (e.g. renames in opposite directions) can't deadlock.
+    """
+    slugs = sorted(set(slugs))
+    with contextlib.ExitStack() as stack:
+        if fcntl is not None:
+            os.makedirs(lock_dir, exist_ok=True)
+        for slug in slugs:
+            with _thread_locks_guard:
+                lock = _thread_locks.setdefault(slug, threading.Lock())
+            stack.enter_context(lock)
+            if fcntl is not None:
+                f = stack.enter_context(open(os.path.join(lock_dir, f'{slug}.lock'), 'a'))
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                stack.callback(fcntl.flock, f.fileno(), fcntl.LOCK_UN)
+        yield
+
+
+class ThumbnailProcessor:
+    """Resize and re-encode uploaded thumbnails on a background thread pool.
+
+    submit() returns the thumbnail's final URL right away; the file appears
+    there once encoding finishes (WebP when Pillow supports it, else JPEG).
+    """
+
+    def __init__(self, folder, url_prefix, max_workers=2, logger=None):
+        self.folder = folder
+        self.url_prefix = url_prefix
+        self.logger = logger
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='thumbnails')
+
+    def _format(self):
+        return 'webp' if 'webp' in image_formats() else 'jpeg'
+
+    def filename(self, slug):
+        return f"{slug}.{'jpg' if self._format() == 'jpeg' else self._format()}"
+
+    def submit(self, slug, data):
+        """Queue raw upload bytes for encoding; returns the URL the thumbnail will have"""
+        filename = self.filename(slug)
+        self._pool.submit(self._encode, filename, data)
+        return f'{self.url_prefix}/{filename}'
+
+    def _encode(self, filename, data):
+        path = os.path.join(self.folder, filename)
+        tmp = os.path.join(self.folder, f'.{filename}.{threading.get_ident()}.tmp')
+        fmt = self._format()
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            encode_image(io.BytesIO(data), tmp, THUMBNAIL_WIDTH, fmt, QUALITY[fmt])
+            os.replace(tmp, path)
+        except Exception as e:
+            with contextlib.suppress(OSError):
+                os.remove(tmp)
+            if self.logger:
+                self.logger.error(f"Error processing thumbnail {filename}: {str(e)}")
+
+    def rename(self, old_slug, new_slug):
+        """Move an existing processed thumbnail along with its post"""
+        old = os.path.join(self.folder, self.filename(old_slug))
+        if os.path.exists(old):
+            os.replace(old, os.path.join(self.folder, self.filename(new_slug)))
+            return f'{self.url_prefix}/{self.filename(new_slug)}'
+        return None
@@ -0,0 +1,48 @@
+import os
+import secrets
+
+# Settings that differ between local development and production, picked with APP_ENV
+PROFILES = {
+    'development': {
+        'DEBUG': True,
+        'TEMPLATES_AUTO_RELOAD': True,  # Templates are re-read when edited
+        'CONTENT_RELOAD_INTERVAL': 2,  # Seconds between checks for changed content files
+        'PREWARM_ENABLED': False,  # Pages render on first request, so edits show up right away
+    },
+    'production': {
+        'DEBUG': False,
+        'TEMPLATES_AUTO_RELOAD': False,  # Compiled templates are kept until the server reloads
+        'CONTENT_RELOAD_INTERVAL': 30,
+        # wsgi.py turns it on for long-running servers; serverless hosts like Vercel run app.py
+        # per request, with nothing rendered ahead and no process to keep a watcher in
+        'PREWARM_ENABLED': False,
+    },
+}
+DEV_SECRET_KEY = 'your-secret-key-here'
+# Snapshots, saved indexes, locks and resized images; Vercel's filesystem is read-only outside /tmp
+CACHE_DIR = os.path.join('/tmp', 'site-cache') if os.environ.get('VERCEL') else '.cache'
+
+
+def load_config(app):
+    """Apply the APP_ENV profile (default "development"), then overrides from the environment.
+
+    Any setting can be overridden with a FLASK_-prefixed variable, e.g.
+    FLASK_PAGE_MAX_AGE=60; values are parsed as JSON where possible. The
+    secret key comes from APP_SECRET.
+    """
+    profile = os.environ.get('APP_ENV', 'development')
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown APP_ENV {profile!r}, expected one of: {', '.join(PROFILES)}")
+    app.config.update(PROFILES[profile], APP_ENV=profile)
+    app.config.from_prefixed_env()
+
+    secret = os.environ.get('APP_SECRET')
+    if not secret:
+        if profile == 'production':
+            # Shared by every worker when the app is preloaded, but sessions won't survive a restart
+            app.logger.warning("APP_SECRET is not set, using a random secret key")
+            secret = secrets.token_hex(32)
+        else:
+            secret = DEV_SECRET_KEY
+    app.secret_key = secret
+    return profile
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from flask import Response, request
+
+from metrics import span
+
+# Schemas describe required keys and their types: a dict lists required keys
+# (extra keys are allowed), a one-item list is "list of", a type or tuple of
+# types is checked with isinstance.
+_SECTION = {'enabled': bool}
+TRACKING_SCHEMA = {
+    'tracking': {
+        'browser_fingerprint': _SECTION,
+        'location_data': _SECTION,
+        'activity_metrics': _SECTION,
+        'performance_metrics': _SECTION,
+    },
+    'storage': dict,
+    'privacy': {
+        'gdpr_compliant': bool,
+        'anonymize_ip': bool,
+        'cookie_consent_required': bool,
+    },
+}
+OFFERINGS_SCHEMA = {
+    'offerings': [{
+        'id': str,
+        'title': str,
+        'description': str,
+        'benefits': [str],
+        'slots_left': int,
+        'slots_limited': bool,
+        'price': (int, float),
+    }],
+}
+
+
+class ConfigError(ValueError):
+    """A configuration file that doesn't match its schema"""
+
+
+def validate(value, schema, path='$'):
+    """Raise ConfigError if value doesn't match schema"""
+    if isinstance(schema, dict):
+        if not isinstance(value, dict):
+            raise ConfigError(f'{path}: expected a mapping')
+        for key, child in schema.items():
+            if key not in value:
+                raise ConfigError(f'{path}: missing key {key!r}')
+            validate(value[key], child, f'{path}.{key}')
+    elif isinstance(schema, list):
+        if not isinstance(value, list):
+            raise ConfigError(f'{path}: expected a list')
+        for i, item in enumerate(value):
+            validate(item, schema[0], f'{path}[{i}]')
+    elif not isinstance(value, schema):
+        names = ' or '.join(t.__name__ for t in (schema if isinstance(schema, tuple) else (schema,)))
+        raise ConfigError(f'{path}: expected {names}, got {type(value).__name__}')
+
+
+def yaml_load(raw):
+    """Parse YAML, with libyaml when PyYAML was built with it; yaml is imported on first use"""
+    import yaml
+    return yaml.load(raw, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+
+
+@span('load_config_file')
+def load_file(path):
+    """Parse a YAML or JSON file, by extension"""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if path.endswith(('.yaml', '.yml')):
+        return yaml_load(raw)
+    return json.loads(raw)
+
+
+class ConfigRegistry:
+    """Parsed, validated configuration files with ready-to-send JSON bodies.
+
+    Each file is parsed on first access and re-read only when its mtime or
+    size changes (checked at most every ``check_interval`` seconds). If a file fails to
+    parse or validate, the error is logged and the last good version keeps
+    being served.
+    """
+
+    def __init__(self, check_interval=0, logger=None):
+        self.check_interval = check_interval
+        self.logger = logger
+        self._configs = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, path, schema=None):
+        # Parsed on first access, so startup doesn't pay for configs a request may never need
+        self._configs[name] = {'path': path, 'schema': schema, 'stamp': None, 'checked': float('-inf'),
+                               'data': None, 'body': None, 'etag': None}
+
+    def _reload(self, name):
+        entry = self._configs[name]
+        stamp = None
+        try:
+            st = os.stat(entry['path'])
+            stamp = (st.st_mtime_ns, st.st_size)
+            if stamp == entry['stamp']:
+                return
+            data = load_file(entry['path'])
+            if entry['schema'] is not None:
+                validate(data, entry['schema'])
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Error loading {entry['path']}: {str(e)}")
+            if stamp is not None and entry['data'] is not None:
+                # Keep serving the last good version without re-parsing until the file changes again
+                self._configs[name] = dict(entry, stamp=stamp)
+            return
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self._configs[name] = dict(entry, stamp=stamp, data=data, body=body,
+                                   etag=hashlib.sha256(body).hexdigest()[:32])
+
+    def _entry(self, name):
+        entry = self._configs[name]
+        now = time.monotonic()
+        if now - entry['checked'] >= self.check_interval:
+            with self._lock:
+                entry = self._configs[name]
+                if now - entry['checked'] >= self.check_interval:
+                    self._reload(name)
+                    self._configs[name]['checked'] = time.monotonic()
+                    entry = self._configs[name]
+        return entry
+
+    def invalidate(self):
+        """Make the next access to each config re-check its file"""
+        with self._lock:
+            for entry in self._configs.values():
+                entry['checked'] = float('-inf')
+
+    def get(self, name):
+        """Parsed data for a registered config"""
+        return self._entry(name)['data']
+
+    def by_filename(self, filename):
+        """Name of the config loaded from a JSON file in the configurations folder, or None.
+
+        Only JSON sources are matched: the pre-serialized body is JSON, so
+        serving it for a YAML file's URL would change that file's format.
+        """
+        for name, entry in self._configs.items():
+            if entry['path'].endswith('.json') and os.path.basename(entry['path']) == filename:
+                return name
+        return None
+
+    def response(self, name):
+        """JSON response with the pre-serialized body, answering If-None-Match with 304"""
+        entry = self._entry(name)
+        if entry['body'] is None:
+            raise ConfigError(f"{entry['path']} could not be loaded")
+        response = Response(entry['body'], mimetype='application/json')
+        response.set_etag(entry['etag'])
+        return response.make_conditional(request)
+
+
+def init_configs(app):
+    """Register tracking.yaml and offerings.json in a shared registry"""
+    folder = os.path.join(app.static_folder, 'configurations')
+    configs = ConfigRegistry(check_interval=app.config.get('CONTENT_RELOAD_INTERVAL', 0), logger=app.logger)
+    configs.register('tracking', os.path.join(folder, 'tracking.yaml'), TRACKING_SCHEMA)
+    configs.register('offerings', os.path.join(folder, 'offerings.json'), OFFERINGS_SCHEMA)
+    app.extensions['configs'] = configs
+    return configs
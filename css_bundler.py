@@ -0,0 +1,261 @@
+import hashlib
+import os
+import posixpath
+import re
+import threading
+
+from flask import Response, abort, url_for
+from markupsafe import Markup, escape
+
+from assets import IMMUTABLE_MAX_AGE
+from config_registry import yaml_load
+
+IMPORT_RE = re.compile(
+    r'''@import\s+(?:url\(\s*(?:"([^"]*)"|'([^']*)'|([^)\s]*))\s*\)|"([^"]*)"|'([^']*)')\s*([^;]*);''',
+    re.IGNORECASE)
+URL_RE = re.compile(r'url\(\s*([\'"]?)([^\'")]+)\1\s*\)', re.IGNORECASE)
+TOKEN_RE = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|(/\*.*?\*/)', re.DOTALL)
+
+
+def is_remote(path):
+    return path.startswith(('http:', 'https:', '//', 'data:'))
+
+
+def rebase_urls(css, rel_dir, base_url):
+    """Make relative url() references absolute so they survive bundling"""
+    def _sub(m):
+        quote, target = m.group(1), m.group(2).strip()
+        if is_remote(target) or target.startswith(('/', '#')):
+            return m.group(0)
+        path = posixpath.normpath(posixpath.join(base_url, rel_dir, target))
+        return f'url({quote}{path}{quote})'
+    return URL_RE.sub(_sub, css)
+
+
+def resolve_imports(css_root, rel_path, base_url, seen, remote, missing):
+    """Inline local @import rules recursively, starting from one stylesheet.
+
+    Each file is included once, at its first import. Remote imports (fonts)
+    are collected in ``remote`` so they can be hoisted to the top of the
+    bundle, and unresolvable imports are recorded in ``missing``.
+    """
+    rel_path = posixpath.normpath(rel_path)
+    if rel_path in seen:
+        return ''
+    seen.add(rel_path)
+    try:
+        with open(os.path.join(css_root, rel_path), 'r', encoding='utf-8') as f:
+            css = f.read()
+    except FileNotFoundError:
+        missing.append(rel_path)
+        return ''
+
+    rel_dir = posixpath.dirname(rel_path)
+
+    def _sub(m):
+        target = next(g for g in m.groups()[:5] if g is not None)
+        media = m.group(6).strip()
+        if is_remote(target):
+            remote.append(m.group(0))
+            return ''
+        inlined = resolve_imports(css_root, posixpath.join(rel_dir, target), base_url,
+                                  seen, remote, missing)
+        return f'@media {media}{{{inlined}}}' if media and inlined else inlined
+
+    # Inlined files are already rebased, so only this file's own url()s change
+    return rebase_urls(IMPORT_RE.sub(_sub, css), rel_dir, base_url)
+
+
+def minify(css):
+    """Strip comments and redundant whitespace, leaving strings untouched"""
+    out = []
+    pos = 0
+    for m in TOKEN_RE.finditer(css):
+        out.append(_minify_code(css[pos:m.start()]))
+        if m.group(1):
+            out.append(m.group(1))
+        pos = m.end()
+    out.append(_minify_code(css[pos:]))
+    return ''.join(out).strip()
+
+
+def _minify_code(code):
+    code = re.sub(r'\s+', ' ', code)
+    code = re.sub(r'\s*([{};,>])\s*', r'\1', code)
+    code = re.sub(r':\s+', ':', code)
+    return code.replace(';}', '}')
+
+
+def split_statements(css):
+    """Split minified CSS into top-level statements (rules and at-rules)"""
+    statements = []
+    depth = 0
+    start = 0
+    quote = None
+    i = 0
+    while i < len(css):
+        ch = css[i]
+        if quote:
+            if ch == '\\':
+                i += 1
+            elif ch == quote:
+                quote = None
+        elif ch in '"\'':
+            quote = ch
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                statements.append(css[start:i + 1])
+                start = i + 1
+        elif ch == ';' and depth == 0:
+            statements.append(css[start:i + 1])
+            start = i + 1
+        i += 1
+    if css[start:].strip():
+        statements.append(css[start:])
+    return statements
+
+
+def dedupe(statements):
+    """Drop repeated identical statements, keeping the last so the cascade is unchanged"""
+    last = {stmt: i for i, stmt in enumerate(statements)}
+    return [stmt for i, stmt in enumerate(statements) if last[stmt] == i]
+
+
+def build_bundle(css_root, files, base_url):
+    """Concatenate, de-duplicate and minify stylesheets in order"""
+    seen, remote, missing = set(), [], []
+    parts = [resolve_imports(css_root, rel, base_url, seen, remote, missing) for rel in files]
+    statements = dedupe(split_statements(minify('\n'.join(parts))))
+    # @import must precede every other rule, so remote imports go first
+    imports = list(dict.fromkeys(minify(rule) for rule in remote))
+    return ''.join(imports + statements), sorted(seen), missing
+
+
+class CSSBundles:
+    """Stylesheet bundles per page type, built in memory from a YAML config.
+
+    Bundles are built on first use, and rebuilt when the config or any
+    source stylesheet changes if ``auto_reload`` is set (debug mode).
+    """
+
+    def __init__(self, config_path, css_root, base_url, auto_reload=False, logger=None):
+        self.config_path = config_path
+        self.css_root = css_root
+        self.base_url = base_url
+        self.auto_reload = auto_reload
+        self.logger = logger
+        self._bundles = {}
+        self._pages = {}
+        self._stamps = None
+        self._lock = threading.Lock()
+
+    def _stat_all(self, paths):
+        stamps = {}
+        for path in paths:
+            try:
+                st = os.stat(path)
+                stamps[path] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                stamps[path] = None
+        return stamps
+
+    def build(self):
+        """Read the config and build every bundle"""
+        with open(self.config_path, 'r', encoding='utf-8') as f:
+            config = yaml_load(f.read()) or {}
+
+        bundles = {}
+        sources = {self.config_path}
+        for name, spec in (config.get('bundles') or {}).items():
+            css, included, missing = build_bundle(self.css_root, spec['files'], self.base_url)
+            for rel in missing:
+                if self.logger:
+                    self.logger.warning(f"CSS bundle {name}: missing import {rel}")
+            critical = ''
+            if spec.get('critical'):
+                critical, critical_included, _ = build_bundle(self.css_root, spec['critical'], self.base_url)
+                included += critical_included
+            digest = hashlib.sha256(css.encode('utf-8')).hexdigest()[:10]
+            bundles[name] = {
+                'name': name,
+                'files': spec['files'],
+                'css': css.encode('utf-8'),
+                'critical': critical,
+                'filename': f'{name}.{digest}.css',
+            }
+            sources.update(os.path.join(self.css_root, rel) for rel in included)
+
+        with self._lock:
+            self._bundles = bundles
+            self._pages = config.get('pages') or {}
+            self._stamps = self._stat_all(sources)
+
+    def _check(self):
+        if self._stamps is None or (self.auto_reload and self._stat_all(self._stamps) != self._stamps):
+            self.build()
+
+    def for_page(self, page):
+        """Bundle for a page type, falling back to the default bundle"""
+        self._check()
+        name = self._pages.get(page) or self._pages.get('default') or 'default'
+        return self._bundles.get(name)
+
+    def by_filename(self, filename):
+        self._check()
+        for bundle in self._bundles.values():
+            if bundle['filename'] == filename:
+                return bundle
+        return None
+
+    def bundles(self):
+        self._check()
+        return list(self._bundles.values())
+
+
+def init_css_bundles(app):
+    """Serve bundled stylesheets and expose css_bundle() to templates.
+
+    With CSS_BUNDLING off, css_bundle() emits the bundle's source files as
+    individual <link> tags instead, in the same order.
+    """
+    config_path = os.path.join(app.static_folder, 'configurations', 'css-bundles.yaml')
+    css_root = os.path.join(app.static_folder, 'css')
+    bundles = CSSBundles(config_path, css_root, f'{app.static_url_path}/css',
+                         auto_reload=app.debug, logger=app.logger)
+    app.extensions['css_bundles'] = bundles
+
+    def css_bundle(page=None):
+        bundle = bundles.for_page(page or 'default')
+        if bundle is None:
+            return Markup('')
+        if not app.config.get('CSS_BUNDLING', True):
+            return Markup('\n'.join(
+                f'<link rel="stylesheet" href="{escape(url_for("static", filename="css/" + rel))}">'
+                for rel in bundle['files']))
+
+        href = escape(url_for('css_bundle_file', filename=bundle['filename']))
+        if not bundle['critical']:
+            return Markup(f'<link rel="stylesheet" href="{href}">')
+        # Inline the critical rules and load the full bundle without blocking render
+        return Markup(
+            f'<style>{bundle["critical"]}</style>\n'
+            f'<link rel="preload" href="{href}" as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+            f'<noscript><link rel="stylesheet" href="{href}"></noscript>')
+
+    app.jinja_env.globals['css_bundle'] = css_bundle
+
+    @app.route('/assets/css/<filename>')
+    def css_bundle_file(filename):
+        bundle = bundles.by_filename(filename)
+        if bundle is None:
+            abort(404)
+        response = Response(bundle['css'], mimetype='text/css')
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+        return response
+
+    return bundles
@@ -0,0 +1,200 @@
+import hashlib
+import json
+import threading
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+from flask import Response, request
+
+from blog_render import render_post
+
+FEED_TITLE = 'Krishna Kumar Soni Blog'
+FEED_DESCRIPTION = 'Articles on product development, management, and technical solutions by Krishna Kumar Soni.'
+XML_DECLARATION = b"<?xml version='1.0' encoding='utf-8'?>\n"
+ATOM_NS = 'http://www.w3.org/2005/Atom'
+JSON_FEED_VERSION = 'https://jsonfeed.org/version/1.1'
+
+# Feed name -> (URL path, mimetype)
+FEEDS = {
+    'rss': ('/feed.xml', 'application/rss+xml'),
+    'atom': ('/atom.xml', 'application/atom+xml'),
+    'json': ('/feed.json', 'application/feed+json'),
+}
+
+
+def _element(tag, *children, **attrs):
+    """Build <tag attrs>children</tag>; each child is an Element or (tag, text, attrs)"""
+    from xml.etree import ElementTree as ET  # Imported when a feed is first built
+    element = ET.Element(tag, attrs)
+    for child in children:
+        if isinstance(child, tuple):
+            name, text, child_attrs = child
+            ET.SubElement(element, name, child_attrs).text = text
+        else:
+            element.append(child)
+    return element
+
+
+def _xml(element):
+    from xml.etree import ElementTree as ET
+    return ET.tostring(element, encoding='unicode').encode('utf-8')
+
+
+def _published(post):
+    return datetime.fromisoformat(post['date_iso']).replace(tzinfo=timezone.utc)
+
+
+def _modified(stamp, post):
+    if stamp and stamp[0]:
+        return datetime.fromtimestamp(stamp[0] / 1e9, timezone.utc).replace(microsecond=0)
+    return _published(post)
+
+
+class Feeds:
+    """RSS 2.0, Atom and JSON Feed documents for the newest blog posts.
+
+    Every entry is serialized once per format and kept with the file stamp
+    it was built from, so a new or edited post only costs its own entries;
+    the rest are reused as-is. Documents are sent as a stream of those
+    fragments and carry an ETag derived from the entries they contain.
+    """
+
+    def __init__(self, blog_index, site_url, size=20):
+        self.blog_index = blog_index
+        self.site_url = site_url
+        self.size = size
+        self._version = None
+        self._entries = {}  # slug -> (stamp, {format: fragment})
+        self._documents = {}  # format -> (etag, chunks)
+        self._lock = threading.Lock()
+
+    def _entry(self, post, stamp):
+        """Serialized RSS item, Atom entry and JSON Feed item for a post"""
+        url = f"{self.site_url}/blog/{post['slug']}"
+        content = render_post(post['content'])['content']
+        published = _published(post)
+        modified = _modified(stamp, post)
+        rss = _element('item',
+                       ('title', post['title'], {}),
+                       ('link', url, {}),
+                       ('guid', url, {'isPermaLink': 'true'}),
+                       ('pubDate', format_datetime(published), {}),
+                       ('category', post['category'], {}),
+                       ('description', content, {}))
+        atom = _element('entry',
+                        ('title', post['title'], {}),
+                        ('link', None, {'href': url}),
+                        ('id', url, {}),
+                        ('published', published.isoformat(), {}),
+                        ('updated', modified.isoformat(), {}),
+                        ('category', None, {'term': post['category']}),
+                        ('summary', post['subtitle'] or post['excerpt'], {}),
+                        ('content', content, {'type': 'html'}))
+        item = {
+            'id': url,
+            'url': url,
+            'title': post['title'],
+            'summary': post['subtitle'] or post['excerpt'],
+            'content_html': content,
+            'date_published': published.isoformat(),
+            'date_modified': modified.isoformat(),
+            'tags': [post['category']],
+        }
+        if post.get('thumbnail'):
+            item['image'] = post['thumbnail']
+        return {
+            'rss': _xml(rss),
+            'atom': _xml(atom),
+            'json': json.dumps(item, ensure_ascii=False, separators=(',', ':')).encode('utf-8'),
+        }
+
+    def refresh(self):
+        """Rebuild the documents if the blog index changed"""
+        posts = self.blog_index.posts()
+        if self.blog_index.version == self._version:
+            return
+        with self._lock:
+            version = self.blog_index.version
+            if version == self._version:
+                return
+            entries = {}
+            for post in posts[:self.size]:
+                stamp = self.blog_index.stamp(post['slug'])
+                cached = self._entries.get(post['slug'])
+                if cached is None or cached[0] is None or cached[0] != stamp:
+                    cached = (stamp, self._entry(post, stamp))
+                entries[post['slug']] = cached
+
+            key = repr([(slug, stamp) for slug, (stamp, _) in entries.items()]).encode()
+            etag = hashlib.sha256(key).hexdigest()[:16]
+            updated = max((_modified(stamp, post) for post, (stamp, _) in zip(posts, entries.values())),
+                          default=datetime.now(timezone.utc).replace(microsecond=0))
+            self._documents = {name: (f'{etag}-{name}', self._chunks(name, entries, updated))
+                               for name in FEEDS}
+            self._entries = entries
+            self._version = version
+
+    def _chunks(self, name, entries, updated):
+        fragments = [formats[name] for _, formats in entries.values()]
+        path, _ = FEEDS[name]
+        blog_url = f'{self.site_url}/blogs'
+        if name == 'rss':
+            head = _xml(_element('channel',
+                                 ('title', FEED_TITLE, {}),
+                                 ('link', blog_url, {}),
+                                 ('description', FEED_DESCRIPTION, {}),
+                                 ('lastBuildDate', format_datetime(updated), {})))
+            # Entries go inside <channel>, after its metadata
+            return [XML_DECLARATION, b'<rss version="2.0">', head[:-len(b'</channel>')],
+                    *fragments, b'</channel></rss>']
+        if name == 'atom':
+            head = _xml(_element('feed',
+                                 ('title', FEED_TITLE, {}),
+                                 ('subtitle', FEED_DESCRIPTION, {}),
+                                 ('link', None, {'href': blog_url}),
+                                 ('link', None, {'rel': 'self', 'href': f'{self.site_url}{path}'}),
+                                 ('id', f'{self.site_url}{path}', {}),
+                                 ('updated', updated.isoformat(), {}),
+                                 xmlns=ATOM_NS))
+            return [XML_DECLARATION, head[:-len(b'</feed>')], *fragments, b'</feed>']
+        head = json.dumps({
+            'version': JSON_FEED_VERSION,
+            'title': FEED_TITLE,
+            'description': FEED_DESCRIPTION,
+            'home_page_url': blog_url,
+            'feed_url': f'{self.site_url}{path}',
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        items = [fragment for i, item in enumerate(fragments) for fragment in ((b',', item) if i else (item,))]
+        return [head[:-1], b',"items":[', *items, b']}']
+
+    def response(self, name):
+        """Streamed feed document, answering If-None-Match with 304"""
+        self.refresh()
+        etag, chunks = self._documents[name]
+        # make_conditional() would buffer the stream, so If-None-Match is checked here
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(iter(chunks), mimetype=FEEDS[name][1])
+        response.set_etag(etag)
+        response.cache_control.public = True
+        return response
+
+
+def init_feeds(app):
+    """Serve /feed.xml (RSS), /atom.xml and /feed.json for the newest posts"""
+    feeds = Feeds(app.extensions['blog_index'], app.config['SITE_URL'], app.config.get('FEED_SIZE', 20))
+    app.extensions['feeds'] = feeds
+
+    def feed_view(name):
+        def view():
+            try:
+                return feeds.response(name)
+            except Exception as e:
+                app.logger.error(f"Error generating {name} feed: {str(e)}")
+                return Response("Error generating feed", status=500)
+        return view
+
+    for name, (path, _) in FEEDS.items():
+        app.add_url_rule(path, f'{name}_feed', feed_view(name))
+    return feeds
@@ -0,0 +1,62 @@
+"""gunicorn settings for production: gunicorn -c gunicorn.conf.py wsgi:app
+
+Worker and thread counts default to values derived from the CPU count and
+can be overridden with WEB_CONCURRENCY and GUNICORN_THREADS. Send SIGHUP to
+the master to pick up content and template changes without dropping
+requests: caches are refreshed in the master, new workers are forked from
+it, and the old ones finish their in-flight requests before exiting. With
+pre-warming on (the production default) each worker also watches for
+changes itself and re-renders the affected pages, so SIGHUP is only needed
+for code changes.
+"""
+import gc
+import multiprocessing
+import os
+
+os.environ.setdefault('APP_ENV', 'production')
+# Each worker saves its metrics here so /metrics can report all of them
+os.environ.setdefault('FLASK_METRICS_DIR', os.path.join('.cache', 'metrics'))
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '8082')}")
+# Rendering markdown and templates is CPU-bound, so scale processes with cores;
+# threads cover requests waiting on disk or slow clients
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+worker_class = 'gthread'
+preload_app = True  # Import and warm the app once; workers share its memory copy-on-write
+keepalive = 5
+timeout = 30
+graceful_timeout = 30
+accesslog = '-'
+
+
+def on_starting(server):
+    # Metrics saved by workers of a previous run would otherwise be added to this one's
+    from wsgi import app
+    shared = app.extensions.get('shared_metrics')
+    if shared is not None:
+        shared.clear()
+
+
+def pre_fork(server, worker):
+    # Keep the garbage collector from touching (and so copying) the preloaded caches in each worker
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Threads don't survive the fork, so each worker starts its own pre-warm watcher and metrics writer
+    from wsgi import app
+    prewarm = app.extensions.get('prewarm')
+    if prewarm is not None:
+        prewarm.start()
+    shared = app.extensions.get('shared_metrics')
+    if shared is not None:
+        shared.start()
+
+
+def on_reload(server):
+    """SIGHUP: refresh caches in the master so replacement workers start warm"""
+    from wsgi import app, prerender, warm_caches
+    warm_caches(app)
+    prerender(app)
+    server.log.info("Caches refreshed, replacing workers")
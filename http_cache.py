@@ -0,0 +1,195 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+from flask import Response, g, request
+
+from blog_index import read_generation
+from caching import LRUCache
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+# Routes whose output depends only on the URL and the files on disk
+CACHED_ENDPOINTS = {'index', 'offerings', 'solutions', 'resume', 'tools', 'blogs', 'blog',
+                    'api_blogs', 'sitemap', 'sitemap_part', 'robots', 'tracking_config'}
+# Query arguments a cached endpoint reads; a request with any other argument isn't cached
+CACHED_ARGS = {'blogs': ('page', 'category', 'year')}
+COMPRESSIBLE_TYPES = {'text/html', 'text/plain', 'text/xml', 'application/xml', 'application/json'}
+MIN_COMPRESS_SIZE = 512
+# Quality 11 takes ~25x longer on a typical page for ~10% smaller output, and pages are
+# recompressed whenever any source file changes
+BROTLI_QUALITY = 5
+
+
+class SourceVersion:
+    """Fingerprint of every file pages are rendered from.
+
+    Stats the given directories (content, templates, static) at most once
+    per ``check_interval`` seconds, or as soon as the ``generation_path``
+    file changes (bumped after blog writes in any worker). The fingerprint
+    changes whenever any file is added, removed or modified.
+    """
+
+    def __init__(self, roots, check_interval=0, generation_path=None):
+        self.roots = roots
+        self.check_interval = check_interval
+        self.generation_path = generation_path
+        self._generation = None
+        self._current = None
+        self._last_check = None
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        h = hashlib.sha256()
+        newest = 0
+        for root in self.roots:
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames.sort()
+                for name in sorted(filenames):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    h.update(f'{path}:{st.st_mtime_ns}:{st.st_size}\n'.encode())
+                    newest = max(newest, st.st_mtime)
+        return h.hexdigest()[:16], datetime.fromtimestamp(int(newest), timezone.utc)
+
+    def current(self, force=False):
+        """Return (fingerprint, newest modification time); force rescans now"""
+        now = time.monotonic()
+        generation = read_generation(self.generation_path)
+        if (force or self._current is None or generation != self._generation
+                or now - self._last_check >= self.check_interval):
+            with self._lock:
+                if (force or self._current is None or generation != self._generation
+                        or now - self._last_check >= self.check_interval):
+                    self._current = self._scan()
+                    self._generation = generation
+                    self._last_check = now
+        return self._current
+
+
+def _encode(entry, encoding):
+    """Compressed body for an entry, compressing at most once per encoding"""
+    body = entry['encodings'].get(encoding)
+    if body is None:
+        if encoding == 'br':
+            body = brotli.compress(entry['body'], quality=BROTLI_QUALITY)
+        else:
+            body = gzip.compress(entry['body'], compresslevel=9, mtime=0)
+        entry['encodings'][encoding] = body
+    return body
+
+
+def _apply(entry, response, max_age):
+    """Fill a response from a cache entry: body, encoding and validators"""
+    encoding = None
+    if len(entry['body']) >= MIN_COMPRESS_SIZE:
+        if brotli is not None and request.accept_encodings['br']:
+            encoding = 'br'
+        elif request.accept_encodings['gzip']:
+            encoding = 'gzip'
+
+    # Each encoding is a different byte sequence, so it gets its own strong ETag
+    if encoding:
+        response.set_data(_encode(entry, encoding))
+        response.headers['Content-Encoding'] = encoding
+        response.set_etag(f"{entry['etag']}-{encoding}")
+    else:
+        response.set_data(entry['body'])
+        response.set_etag(entry['etag'])
+    response.vary.add('Accept-Encoding')
+    response.last_modified = entry['last_modified']
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response.make_conditional(request)
+
+
+def skip_page_cache():
+    """Keep the current response out of the page cache, e.g. for a filter matching nothing"""
+    g.page_cache_skip = True
+
+
+def page_key(hosts):
+    """Page cache key for the current request, or None if it shouldn't be cached.
+
+    Only the canonical hosts and the arguments the endpoint reads are part of
+    the key, so stray query strings and Host headers can't push pre-rendered
+    pages out of the cache.
+    """
+    if request.host not in hosts:
+        return None
+    allowed = CACHED_ARGS.get(request.endpoint, ())
+    if any(name not in allowed or len(values) > 1 for name, values in request.args.lists()):
+        return None
+    query = urlencode([(name, request.args[name]) for name in allowed if name in request.args])
+    return f"{request.host_url.rstrip('/')}{request.path}" + (f'?{query}' if query else '')
+
+
+def init_http_cache(app):
+    """Conditional GET and cached compressed bodies for rendered pages.
+
+    A rendered page is stored with the source fingerprint it was rendered
+    from. While no content, template or static file has changed, repeat
+    requests are answered from the cache without running the view: 304 when
+    If-None-Match/If-Modified-Since match, otherwise the stored body in the
+    best encoding the client accepts. Pages are cached only for the hosts of
+    SITE_URL and PREWARM_BASE_URLS, or PAGE_CACHE_HOSTS when set.
+    """
+    sources = SourceVersion([str(app.config['CONTENT_DIR']),
+                             os.path.join(app.root_path, app.template_folder),
+                             app.static_folder],
+                            check_interval=app.config.get('CONTENT_RELOAD_INTERVAL', 0),
+                            generation_path=app.config.get('CONTENT_GENERATION_FILE'))
+    pages = LRUCache(app.config.get('PAGE_CACHE_SIZE', 256))
+    max_age = app.config.get('PAGE_MAX_AGE', 0)
+    app.extensions['page_cache'] = pages
+    app.extensions['page_sources'] = sources
+    base_urls = app.config.get('PAGE_CACHE_HOSTS') or [app.config['SITE_URL'], *(app.config.get('PREWARM_BASE_URLS') or [])]
+    hosts = {urlsplit(url).netloc if '//' in url else url for url in base_urls}
+
+    @app.before_request
+    def serve_cached_page():
+        if request.method not in ('GET', 'HEAD') or request.endpoint not in CACHED_ENDPOINTS:
+            return None
+        version, last_modified = sources.current()
+        key = page_key(hosts)
+        if key is None:
+            return None
+        g.page_version = (version, last_modified)
+        g.page_key = key
+        entry = pages.get(key)
+        if entry is None or entry['version'] != version:
+            return None
+        g.page_cached = True
+        return _apply(entry, Response(status=entry['status'], content_type=entry['content_type']), max_age)
+
+    @app.after_request
+    def cache_page(response):
+        if ('page_version' not in g or g.get('page_cached') or g.get('page_cache_skip') or response.status_code != 200
+                or response.direct_passthrough or response.is_streamed or response.mimetype not in COMPRESSIBLE_TYPES
+                or 'Content-Encoding' in response.headers or 'Set-Cookie' in response.headers):
+            return response
+        version, last_modified = g.page_version
+        body = response.get_data()
+        entry = {
+            'version': version,
+            'etag': hashlib.sha256(body).hexdigest()[:32],
+            'last_modified': last_modified,
+            'status': response.status_code,
+            'content_type': response.content_type,
+            'body': body,
+            'encodings': {},
+        }
+        pages.put(g.page_key, entry)
+        return _apply(entry, response, max_age)
+
+    return pages
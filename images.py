@@ -0,0 +1,239 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from flask import url_for
+from markupsafe import Markup, escape
+
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp', 'jpeg': 'image/jpeg', 'png': 'image/png'}
+SOURCE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.avif'}
+QUALITY = {'webp': 80, 'avif': 60, 'jpeg': 85}
+
+
+class ImageManifest:
+    """Responsive derivatives written by scripts/generate_images.py.
+
+    Maps source paths (relative to static/images) to their resized WebP/AVIF
+    variants. A missing manifest just means no derivatives are available.
+    """
+
+    def __init__(self, path, auto_reload=False):
+        self.path = path
+        self.auto_reload = auto_reload
+        self._entries = {}
+        self._stamp = None
+        self._lock = threading.Lock()
+        self.load()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def load(self):
+        stamp = self._stat()
+        entries = {}
+        if stamp is not None:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        with self._lock:
+            self._entries, self._stamp = entries, stamp
+
+    def get(self, rel):
+        if self.auto_reload and self._stat() != self._stamp:
+            self.load()
+        return self._entries.get(rel)
+
+
+class ImageCache:
+    """Disk cache of resized image variants, capped in size with LRU eviction.
+
+    Files are named by a hash of the source content and the resize options,
+    so an edited source never serves a stale variant. Concurrent requests for
+    the same missing variant wait for a single encode instead of each running
+    their own, and a variant another worker process already wrote is used
+    as-is. The directory is shared by all workers, so it is re-scanned after
+    each encode and the size cap covers every worker's files.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # filename -> size, least recently used first
+        self._total = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._scan()
+
+    def _list(self):
+        """(atime, name, size) of every variant on disk, oldest access first"""
+        found = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.is_file() and not entry.name.endswith('.tmp'):
+                        st = entry.stat()
+                        found.append((st.st_atime, entry.name, st.st_size))
+        except OSError:
+            pass
+        return sorted(found)
+
+    def _scan(self):
+        """Pick up variants from previous runs, oldest access first"""
+        for _, name, size in self._list():
+            self._entries[name] = size
+            self._total += size
+
+    def _sync(self):
+        """Count variants other workers wrote and forget ones they evicted"""
+        found = self._list()
+        on_disk = {name for _, name, _ in found}
+        with self._lock:
+            for name in [name for name in self._entries if name not in on_disk]:
+                self._total -= self._entries.pop(name)
+            # Files this process hasn't served go first in line for eviction
+            for _, name, size in reversed(found):
+                if name not in self._entries:
+                    self._entries[name] = size
+                    self._entries.move_to_end(name, last=False)
+                    self._total += size
+
+    @staticmethod
+    def key(digest, width, fmt, quality):
+        return hashlib.sha256(f'{digest}:{width}:{fmt}:{quality}'.encode()).hexdigest()[:32]
+
+    def _hit(self, name):
+        with self._lock:
+            if name not in self._entries:
+                return False
+            self._entries.move_to_end(name)
+        return True
+
+    def _add(self, name, size):
+        evicted = []
+        with self._lock:
+            self._total += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old, old_size = self._entries.popitem(last=False)
+                self._total -= old_size
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(os.path.join(self.cache_dir, old))
+            except FileNotFoundError:
+                pass
+
+    def get(self, source, digest, width, fmt, quality):
+        """Path of the cached variant, encoding it first if needed"""
+        name = f'{self.key(digest, width, fmt, quality)}.{fmt}'
+        path = os.path.join(self.cache_dir, name)
+        while True:
+            if self._hit(name) and os.path.exists(path):
+                return path, name
+            with self._lock:
+                event = self._pending.get(name)
+                owner = event is None
+                if owner:
+                    event = self._pending[name] = threading.Event()
+            if owner:
+                break
+            # Another request is encoding this variant; use its result
+            event.wait()
+
+        try:
+            if not os.path.exists(path):
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+                try:
+                    encode_image(source, tmp, width, fmt, quality)
+                    os.replace(tmp, path)
+                except Exception:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                    raise
+                self._sync()
+            self._add(name, os.path.getsize(path))
+        finally:
+            with self._lock:
+                del self._pending[name]
+            event.set()
+        return path, name
+
+
+def encode_image(source, target, width, fmt, quality):
+    """Resize an image to ``width`` (never upscaling) and save it as ``fmt``"""
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as img:
+        # EXIF isn't carried over, so turn photos upright from their orientation tag first
+        img = ImageOps.exif_transpose(img)
+        if fmt == 'jpeg' and img.mode != 'RGB':
+            img = img.convert('RGB')
+        elif img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if img.mode in ('LA', 'PA') or 'transparency' in img.info else 'RGB')
+        if width < img.width:
+            img = img.resize((width, round(img.height * width / img.width)), Image.Resampling.LANCZOS)
+        options = {'quality': quality} if fmt in QUALITY else {'optimize': True}
+        img.save(target, fmt.upper(), **options)
+
+
+@functools.lru_cache(maxsize=None)
+def image_formats():
+    """Output formats this Pillow build can encode"""
+    from PIL import Image
+
+    extensions = Image.registered_extensions()
+    return tuple(fmt for fmt, ext in (('avif', '.avif'), ('webp', '.webp'), ('jpeg', '.jpg'), ('png', '.png'))
+            if ext in extensions)
+
+
+def _attributes(attrs):
+    return ''.join(f' {escape(name)}="{escape(value)}"' for name, value in attrs.items() if value is not None)
+
+
+def init_images(app):
+    """Expose picture() to templates for responsive <picture>/srcset markup"""
+    manifest = ImageManifest(os.path.join(app.static_folder, 'images', 'derived', 'manifest.json'),
+                             auto_reload=app.debug)
+    app.extensions['images'] = manifest
+    app.extensions['image_cache'] = ImageCache(app.config.get('IMAGE_CACHE_DIR', os.path.join('.cache', 'images')),
+                                               app.config.get('IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+    def picture(filename, alt='', sizes='100vw', **attrs):
+        """Render a static image, with WebP/AVIF sources when derivatives exist.
+
+        ``filename`` is relative to static/, like url_for('static'). Extra
+        keyword arguments become attributes of the <img> element.
+        """
+        img = _attributes(dict({'src': url_for('static', filename=filename), 'alt': alt}, **attrs))
+        rel = filename[len('images/'):] if filename.startswith('images/') else None
+        entry = manifest.get(rel) if rel else None
+        if not entry:
+            return Markup(f'<img{img}>')
+
+        sources = []
+        for fmt, variants in entry['variants'].items():
+            srcset = ', '.join(f"{url_for('static', filename=v['path'])} {v['width']}w" for v in variants)
+            sources.append(f'<source{_attributes({"type": MIME_TYPES[fmt], "srcset": srcset, "sizes": sizes})}>')
+        # display: contents keeps <picture> out of layout, so existing img CSS applies unchanged
+        return Markup(f'<picture style="display: contents">{"".join(sources)}<img{img}></picture>')
+
+    def image_url(filename, width, fmt='webp'):
+        """URL of an on-demand resized variant, for a path under static/images.
+
+        The width is rounded up to the next of IMAGE_WIDTHS, the only ones /img encodes.
+        """
+        widths = sorted(app.config['IMAGE_WIDTHS'])
+        width = next((w for w in widths if w >= width), widths[-1])
+        digest = app.extensions['assets'].digest(f'images/{filename}')
+        return url_for('resized_image', filename=filename, w=width, fmt=fmt, v=digest)
+
+    app.jinja_env.globals['picture'] = picture
+    app.jinja_env.globals['image_url'] = image_url
+    return manifest
@@ -0,0 +1,401 @@
+import bisect
+import contextlib
+import functools
+import heapq
+import hmac
+import os
+import pickle
+import random
+import threading
+import time
+
+from flask import Response, abort, before_render_template, g, has_request_context, request, template_rendered
+
+# Set by prewarm.py on the requests it makes
+PREWARM_ENVIRON_KEY = 'site.prewarm'
+
+# Upper bounds in seconds, as in the Prometheus client defaults
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Counts of observations per bucket, plus their sum"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def copy(self):
+        histogram = Histogram(self.buckets)
+        histogram.counts = list(self.counts)
+        histogram.sum = self.sum
+        return histogram
+
+    def add(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.sum += other.sum
+
+
+class Registry:
+    """Request and span metrics for this process, in Prometheus text format"""
+
+    def __init__(self):
+        self.requests = {}  # (endpoint, method) -> Histogram
+        self.responses = {}  # (endpoint, method, status) -> count
+        self.spans = {}  # span name -> Histogram
+        self._lock = threading.Lock()
+
+    def observe_request(self, endpoint, method, status, seconds):
+        with self._lock:
+            histogram = self.requests.get((endpoint, method))
+            if histogram is None:
+                histogram = self.requests[(endpoint, method)] = Histogram()
+            histogram.observe(seconds)
+            key = (endpoint, method, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def observe_span(self, name, seconds):
+        with self._lock:
+            histogram = self.spans.get(name)
+            if histogram is None:
+                histogram = self.spans[name] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self):
+        """Copy of every series, to save or merge with other processes"""
+        with self._lock:
+            return {
+                'requests': {key: h.copy() for key, h in self.requests.items()},
+                'responses': dict(self.responses),
+                'spans': {key: h.copy() for key, h in self.spans.items()},
+            }
+
+    def reset(self):
+        with self._lock:
+            self.requests, self.responses, self.spans = {}, {}, {}
+
+    def render(self, others=()):
+        """Prometheus text of this registry, added up with snapshots from other processes"""
+        merged = self.snapshot()
+        for other in others:
+            for kind in ('requests', 'spans'):
+                for key, histogram in other[kind].items():
+                    if key in merged[kind]:
+                        merged[kind][key].add(histogram)
+                    else:
+                        merged[kind][key] = histogram
+            for key, count in other['responses'].items():
+                merged['responses'][key] = merged['responses'].get(key, 0) + count
+
+        lines = []
+        _histogram_lines(lines, 'http_request_duration_seconds', 'Request latency by endpoint',
+                         {f'endpoint="{_escape(e)}",method="{m}"': h for (e, m), h in merged['requests'].items()})
+        lines.append('# HELP http_requests_total Responses by endpoint and status')
+        lines.append('# TYPE http_requests_total counter')
+        for (endpoint, method, status), count in sorted(merged['responses'].items()):
+            lines.append(f'http_requests_total{{endpoint="{_escape(endpoint)}",method="{method}",'
+                         f'status="{status}"}} {count}')
+        _histogram_lines(lines, 'app_span_duration_seconds', 'Time spent in named spans',
+                         {f'span="{_escape(name)}"': h for name, h in merged['spans'].items()})
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram_lines(lines, name, help_text, histograms):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for labels, histogram in sorted(histograms.items()):
+        cumulative = 0
+        for bound, count in zip((*histogram.buckets, '+Inf'), histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {histogram.sum:.6f}')
+        lines.append(f'{name}_count{{{labels}}} {cumulative}')
+
+
+registry = Registry()
+_enabled = False
+_local = threading.local()
+
+
+class SharedMetrics:
+    """Adds up the registries of every worker process through a shared directory.
+
+    Each process writes a snapshot of its registry to ``<directory>/<pid>.pickle``
+    every ``interval`` seconds from a background thread. /metrics adds the
+    answering worker's live registry to every other file there, including
+    those of workers that have exited, so counters never go backwards; call
+    clear() when the server starts. A forked worker drops the counts it
+    inherited from the parent, which the parent would report as well.
+    """
+
+    def __init__(self, registry, directory, interval=5, logger=None):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self.logger = logger
+        self._origin = os.getpid()
+        self._pid = None
+        self._warned = False
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'{pid}.pickle')
+
+    def write(self):
+        """Save this process's registry"""
+        path = self._path(os.getpid())
+        tmp = f'{path}.tmp'
+        with self._lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                with open(tmp, 'wb') as f:
+                    pickle.dump(self.registry.snapshot(), f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp, path)
+            except OSError as e:
+                if self.logger and not self._warned:
+                    self.logger.warning(f"Could not save metrics to {self.directory}: {str(e)}")
+                self._warned = True
+
+    def others(self):
+        """Saved snapshots of every process but this one"""
+        snapshots = []
+        own = os.path.basename(self._path(os.getpid()))
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return snapshots
+        for name in names:
+            if not name.endswith('.pickle') or name == own:
+                continue
+            try:
+                with open(os.path.join(self.directory, name), 'rb') as f:
+                    snapshots.append(pickle.load(f))
+            except Exception:
+                continue  # Being replaced, or left half-written by a killed worker
+        return snapshots
+
+    def clear(self):
+        """Remove every saved snapshot"""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def start(self):
+        """Start saving this process's registry (threads don't survive a fork)"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if os.getpid() != self._origin:
+                self.registry.reset()
+            self._pid = os.getpid()
+        threading.Thread(target=self._run, name='metrics-writer', daemon=True).start()
+
+
+class Span:
+    """Timer usable as a context manager or a decorator, see span()"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter() if _enabled else None
+        return self
+
+    def __exit__(self, *exc):
+        if self._start is not None:
+            record_span(self.name, time.perf_counter() - self._start)
+
+    def __call__(self, func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(self.name):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def span(name):
+    """Time a block (``with span('name'):``) or a function (``@span('name')``).
+
+    Durations go into the span histogram and, inside a request, into that
+    request's Server-Timing header. Nested spans are timed independently,
+    so a span's time includes any spans inside it.
+    """
+    return Span(name)
+
+
+@contextlib.contextmanager
+def unrecorded():
+    """Keep spans timed in this thread out of the histograms, e.g. while warming caches.
+
+    Usable as ``with unrecorded():`` or as a decorator. Spans of pre-render
+    requests are left out without it, like the requests themselves.
+    """
+    previous = getattr(_local, 'unrecorded', False)
+    _local.unrecorded = True
+    try:
+        yield
+    finally:
+        _local.unrecorded = previous
+
+
+def record_span(name, seconds):
+    in_request = has_request_context()
+    if not (getattr(_local, 'unrecorded', False) or in_request and request.environ.get(PREWARM_ENVIRON_KEY)):
+        registry.observe_span(name, seconds)
+    if in_request:
+        spans = g.setdefault('spans', {})
+        spans[name] = spans.get(name, 0.0) + seconds
+
+
+class SlowRequestProfiler:
+    """Profile a sample of requests and keep the slowest ``keep`` profiles on disk"""
+
+    def __init__(self, directory, keep, sample_rate=1.0):
+        self.directory = directory
+        self.keep = keep
+        self.sample_rate = sample_rate
+        self._slowest = []  # min-heap of (seconds, path)
+        self._lock = threading.Lock()
+
+    def start(self):
+        if random.random() >= self.sample_rate:
+            return None
+        import cProfile  # Only loaded when PROFILE_SLOWEST is on
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # Another request's profiler is active (Python 3.12+)
+            return None
+        return profiler
+
+    def finish(self, profiler, seconds, endpoint):
+        profiler.disable()
+        with self._lock:
+            if len(self._slowest) >= self.keep and seconds <= self._slowest[0][0]:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f'{seconds * 1000:09.1f}ms-{endpoint}-{time.time_ns()}.prof')
+            profiler.dump_stats(path)
+            heapq.heappush(self._slowest, (seconds, path))
+            if len(self._slowest) > self.keep:
+                _, evicted = heapq.heappop(self._slowest)
+                try:
+                    os.remove(evicted)
+                except OSError:
+                    pass
+
+
+def init_metrics(app):
+    """Per-endpoint latency histograms, Server-Timing headers and /metrics.
+
+    Register before other request hooks so the timing covers them, including
+    pages answered from the page cache. With METRICS_DIR set (gunicorn.conf.py
+    sets it), /metrics adds up every worker process; otherwise it reports
+    the one that answered. /metrics needs ``Authorization: Bearer
+    <METRICS_TOKEN>`` when a token is set, and otherwise only answers
+    requests from this machine that didn't come through a proxy. Setting
+    PROFILE_SLOWEST to N (e.g. FLASK_PROFILE_SLOWEST=10) also profiles a
+    PROFILE_SAMPLE_RATE share of requests with cProfile and keeps the N
+    slowest in PROFILE_DIR.
+    """
+    global _enabled
+    if not app.config.get('METRICS_ENABLED', True):
+        return None
+    _enabled = True
+    app.extensions['metrics'] = registry
+
+    shared = None
+    if app.config.get('METRICS_DIR'):
+        shared = SharedMetrics(registry, str(app.config['METRICS_DIR']),
+                               interval=app.config.get('METRICS_WRITE_INTERVAL', 5), logger=app.logger)
+        app.extensions['shared_metrics'] = shared
+    token = app.config.get('METRICS_TOKEN')
+
+    profiler = None
+    if app.config.get('PROFILE_SLOWEST'):
+        profiler = SlowRequestProfiler(app.config.get('PROFILE_DIR', os.path.join('.cache', 'profiles')),
+                                       int(app.config['PROFILE_SLOWEST']),
+                                       float(app.config.get('PROFILE_SAMPLE_RATE', 1.0)))
+
+    def template_started(sender, template, context, **extra):
+        g.setdefault('template_starts', []).append(time.perf_counter())
+
+    def template_finished(sender, template, context, **extra):
+        starts = g.get('template_starts')
+        if starts:
+            record_span('render_template', time.perf_counter() - starts.pop())
+
+    before_render_template.connect(template_started, app, weak=False)
+    template_rendered.connect(template_finished, app, weak=False)
+
+    @app.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+        if shared is not None and not request.environ.get(PREWARM_ENVIRON_KEY):
+            shared.start()
+        if profiler is not None and request.endpoint != 'metrics':
+            g.profiler = profiler.start()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('request_start', None)
+        if start is None:
+            return response
+        seconds = time.perf_counter() - start
+        endpoint = request.endpoint or 'unmatched'
+        # Pre-rendering isn't visitor traffic, so it stays out of the latency histograms
+        if not request.environ.get(PREWARM_ENVIRON_KEY):
+            registry.observe_request(endpoint, request.method, response.status_code, seconds)
+
+        timings = [f'{name};dur={value * 1000:.2f}' for name, value in g.get('spans', {}).items()]
+        if g.get('page_cached'):
+            timings.append('cache;desc="hit"')
+        timings.append(f'total;dur={seconds * 1000:.2f}')
+        response.headers['Server-Timing'] = ', '.join(timings)
+
+        active = g.pop('profiler', None)
+        if active is not None:
+            profiler.finish(active, seconds, endpoint)
+        return response
+
+    @app.teardown_request
+    def stop_profiler(exc):
+        # A request that failed before after_request still has to switch its profiler off
+        active = g.pop('profiler', None)
+        if active is not None:
+            active.disable()
+
+    def authorized():
+        if token:
+            given = request.headers.get('Authorization', '').encode()
+            return hmac.compare_digest(given, f'Bearer {token}'.encode())
+        return request.remote_addr in ('127.0.0.1', '::1') and 'X-Forwarded-For' not in request.headers
+
+    @app.route('/metrics')
+    def metrics():
+        if not authorized():
+            abort(404)
+        others = shared.others() if shared is not None else ()
+        return Response(registry.render(others), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+    return registry
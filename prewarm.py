@@ -0,0 +1,219 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from flask import request
+
+from metrics import PREWARM_ENVIRON_KEY, unrecorded
+from site_pages import SECTION_PAGES, iter_site_pages
+
+
+@unrecorded()
+def warm_caches(app, assets=True):
+    """Load or refresh every in-memory cache the routes read from.
+
+    Each cache is told to re-check its files now, instead of when its
+    CONTENT_RELOAD_INTERVAL next runs out, and only re-parses files whose
+    mtime changed. Compiled templates are dropped and rebuilt, since
+    production doesn't check templates for changes. Pass ``assets=False``
+    to keep the asset manifest when no static file changed.
+    """
+    start = time.perf_counter()
+    if assets:
+        app.extensions['assets'].build()
+    blog_index = app.extensions['blog_index']
+    blog_index.refresh(force=True)
+    app.extensions['blog_search'].sync()
+    app.extensions['related_posts'].sync()
+    app.extensions['sitemap'].invalidate()
+    app.extensions['sitemap'].refresh()
+    app.extensions['feeds'].refresh()
+    app.extensions['css_bundles'].bundles()
+    configs = app.extensions['configs']
+    configs.invalidate()
+    for name in ('tracking', 'offerings'):
+        configs.get(name)
+    sections = app.extensions['sections']
+    sections.invalidate()
+    for _, section, _ in SECTION_PAGES:
+        sections.get(section)
+
+    app.jinja_env.cache.clear()
+    templates = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    for name in templates:
+        app.jinja_env.get_template(name)
+
+    app.logger.info(f"Warmed caches ({len(blog_index.posts())} posts, "
+                    f"{len(templates)} templates) in {time.perf_counter() - start:.2f}s")
+
+
+class Prewarmer:
+    """Renders pages into the page cache ahead of visitors.
+
+    render_all() requests every page from site_pages (up to the page cache
+    size, main pages first) through the test client. Each page is cached
+    exactly as a real request would cache it. Once started, a background
+    thread polls content, templates and static files every ``interval``
+    seconds. After a change it refreshes the in-memory caches, re-renders
+    the pages that depend on the changed files, and carries every other
+    cached page over to the new source version untouched.
+    """
+
+    def __init__(self, app, base_urls, interval=2, workers=2):
+        self.app = app
+        self.base_urls = base_urls
+        self.interval = interval
+        self.workers = workers
+        self._files = None
+        self._sources = {}  # page path -> source files, as of the last render
+        self._pid = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def _roots(self):
+        app = self.app
+        return [os.path.join(app.root_path, str(app.config['CONTENT_DIR'])),
+                os.path.join(app.root_path, app.template_folder),
+                app.static_folder]
+
+    def _relative(self, path):
+        return os.path.relpath(os.path.join(self.app.root_path, path), self.app.root_path)
+
+    def _snapshot(self):
+        """{path relative to the app root: (mtime_ns, size)} for every watched file"""
+        files = {}
+        uploads = os.path.join(self.app.static_folder, 'uploads')
+        for root in self._roots():
+            for dirpath, dirnames, filenames in os.walk(root):
+                # Uploaded thumbnails are linked by URL, so they never change a page's HTML
+                dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) != uploads]
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    files[self._relative(path)] = (st.st_mtime_ns, st.st_size)
+        return files
+
+    def _pages(self):
+        """Cacheable site pages as {path: set of source files}, main pages before posts"""
+        pages = [page for page in iter_site_pages(self.app) if page['status'] == 200]
+        pages.sort(key=lambda page: page['url'].startswith('/blog/'))
+        return {page['url']: {self._relative(source) for source in page['sources']} for page in pages}
+
+    def _render(self, url):
+        """Request a URL; the page cache stores it unless it's cached and current"""
+        parts = urlsplit(url)
+        client = self.app.test_client()
+        try:
+            client.get(parts.path, query_string=parts.query, base_url=f'{parts.scheme}://{parts.netloc}',
+                       environ_base={PREWARM_ENVIRON_KEY: True})
+        except Exception as e:
+            self.app.logger.error(f"Error pre-rendering {url}: {str(e)}")
+
+    def _render_many(self, urls):
+        with ThreadPoolExecutor(self.workers, thread_name_prefix='prewarm') as pool:
+            list(pool.map(self._render, urls))
+
+    def _limited(self, pages):
+        """The first pages that fit in the page cache alongside the other base URLs"""
+        limit = self.app.extensions['page_cache'].maxsize
+        return list(pages)[:max(1, limit // len(self.base_urls))]
+
+    @unrecorded()
+    def render_all(self):
+        """Render every site page for each base URL, up to the page cache size"""
+        start = time.perf_counter()
+        with self._lock:
+            self._files = self._snapshot()
+            self._sources = self._pages()
+            urls = [f'{base}{path}' for base in self.base_urls for path in self._limited(self._sources)]
+            self._render_many(urls)
+        self.app.logger.info(f"Pre-rendered {len(urls)} pages in {time.perf_counter() - start:.2f}s")
+
+    @unrecorded()
+    def check(self):
+        """Re-render pages affected by files changed since the last check; returns how many"""
+        with self._lock:
+            files = self._snapshot()
+            previous, self._files = self._files, files
+            if previous is None or files == previous:
+                return 0
+            changed = {path for path in files.keys() | previous.keys() if files.get(path) != previous.get(path)}
+
+            static = self._relative(self.app.static_folder) + os.sep
+            warm_caches(self.app, assets=any(path.startswith(static) for path in changed))
+            version = self.app.extensions['page_sources'].current(force=True)[0]
+            # Sources before and after the change, so added and removed posts count too
+            pages, previous_pages = self._pages(), self._sources
+            self._sources = pages
+            mapped = set().union(*pages.values(), *previous_pages.values())
+            # A changed file no page lists (stylesheet, image, offerings.json, ...) may show up anywhere
+            everything = not changed <= mapped
+            affected = {path for path in pages.keys() | previous_pages.keys()
+                        if everything or (pages.get(path, set()) | previous_pages.get(path, set())) & changed}
+
+            page_cache = self.app.extensions['page_cache']
+            urls = {f'{base}{path}' for base in self.base_urls for path in self._limited(pages) if path in affected}
+            for url, entry in page_cache.items():
+                # Listing variants like /blogs?page=2 depend on what their path depends on
+                path = urlsplit(url).path
+                if everything or path in affected or path not in pages:
+                    urls.add(url)
+                elif entry['version'] != version:
+                    page_cache.put(url, dict(entry, version=version))
+            # Drop the old copies first: one rendered from caches that hadn't seen the change yet
+            # could otherwise carry the new version
+            for url in urls:
+                page_cache.pop(url)
+            self._render_many(sorted(urls))
+            return len(urls)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                start = time.perf_counter()
+                count = self.check()
+                if count:
+                    self.app.logger.info(f"Re-rendered {count} pages in {time.perf_counter() - start:.2f}s")
+            except Exception as e:
+                self.app.logger.error(f"Error in pre-warm worker: {str(e)}")
+
+    def start(self):
+        """Start the watcher thread in this process (threads don't survive a fork)"""
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._stop.clear()
+        if self._files is None:
+            self._files = self._snapshot()
+        threading.Thread(target=self._run, name='prewarm-watcher', daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def init_prewarm(app):
+    """Render pages ahead of visitors and keep them fresh when files change.
+
+    Enabled with PREWARM_ENABLED, which wsgi.py turns on. The watcher
+    thread starts with the first request in each process, or from
+    gunicorn's post_fork hook; wsgi.py renders every page before forking.
+    """
+    if not app.config.get('PREWARM_ENABLED'):
+        return None
+    prewarm = Prewarmer(app,
+                        base_urls=[url.rstrip('/') for url in app.config.get('PREWARM_BASE_URLS') or [app.config['SITE_URL']]],
+                        interval=app.config.get('PREWARM_INTERVAL', app.config.get('CONTENT_RELOAD_INTERVAL', 2)),
+                        workers=app.config.get('PREWARM_WORKERS', 2))
+    app.extensions['prewarm'] = prewarm
+
+    @app.before_request
+    def start_prewarm():
+        if not request.environ.get(PREWARM_ENVIRON_KEY):
+            prewarm.start()
+
+    return prewarm
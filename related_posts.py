@@ -0,0 +1,283 @@
+import heapq
+import math
+import os
+import pickle
+import threading
+from collections import Counter
+
+from blog_search import FIELD_WEIGHTS, LINK_TARGET_RE, tokenize
+
+MAX_TERMS = 32  # Highest-weighted terms kept in each post's vector
+MAX_DF_RATIO = 0.5  # Terms in more than this share of posts don't count towards similarity,
+MAX_DF = 1000  # nor in more than this many, which bounds the cost of a full build
+SLACK = 3  # Neighbours kept beyond the number shown, so removals rarely force a row recompute
+REBUILD_DRIFT = 0.25  # Full rebuild once the post count moved this much since the last one
+INDEX_FORMAT = 1
+
+
+def term_counts(fields):
+    counts = Counter()
+    for field, weight in FIELD_WEIGHTS:
+        for token in tokenize(LINK_TARGET_RE.sub(' ', fields.get(field) or '')):
+            counts[token] += weight
+    return counts
+
+
+class RelatedIndex:
+    """TF-IDF vectors and a precomputed top-k neighbour table per post.
+
+    Vectors are sparse dicts of the MAX_TERMS highest-weighted terms,
+    normalized so cosine similarity is a dot product over shared terms,
+    found through a term -> posts inverted index. Each row of the table keeps
+    its best ``k + SLACK`` neighbours and a floor: no post outside the row
+    scores above it. Adding or editing a post recomputes that post's row and
+    offers it to every other row, which only needs the new post's scores;
+    another row is recomputed only if removals leave it with fewer than k
+    neighbours and possibly better ones outside it. Document frequencies
+    drift as posts change, so vectors of untouched posts are refreshed by a
+    full rebuild once the post count has moved by REBUILD_DRIFT.
+    """
+
+    def __init__(self, k=4):
+        self.k = k
+        self._counts = {}  # slug -> Counter of weighted term frequencies
+        self._stamps = {}  # slug -> stamp the post was indexed at
+        self._df = Counter()
+        self._vectors = {}  # slug -> {term: weight}, unit length
+        self._postings = {}  # term -> set of slugs whose vector has it
+        self._rows = {}  # slug -> [floor, [(score, slug), ...] best first]
+        self._built_size = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._counts)
+
+    @property
+    def capacity(self):
+        return self.k + SLACK
+
+    def stamp(self, slug):
+        return self._stamps.get(slug)
+
+    def slugs(self):
+        return list(self._counts)
+
+    def neighbours(self, slug):
+        """Slugs of the k most similar posts, best first"""
+        row = self._rows.get(slug)
+        return [other for _, other in row[1][:self.k]] if row else []
+
+    def _vector(self, counts):
+        n = len(self._counts)
+        max_df = max(1, min(MAX_DF_RATIO * n, MAX_DF))
+        weights = {}
+        for term, tf in counts.items():
+            df = self._df[term]
+            if df <= max_df:
+                weights[term] = (1 + math.log(tf)) * (math.log((1 + n) / (1 + df)) + 1)
+        if len(weights) > MAX_TERMS:
+            weights = dict(heapq.nlargest(MAX_TERMS, weights.items(), key=lambda item: item[1]))
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        return {term: w / norm for term, w in weights.items()}
+
+    def _set_vector(self, slug, vector):
+        for term in self._vectors.pop(slug, ()):
+            postings = self._postings[term]
+            postings.discard(slug)
+            if not postings:
+                del self._postings[term]
+        if vector is not None:
+            self._vectors[slug] = vector
+            for term in vector:
+                self._postings.setdefault(term, set()).add(slug)
+
+    def _scores(self, slug):
+        """Cosine similarity of a post to every post sharing a term with it"""
+        scores = Counter()
+        vectors = self._vectors
+        for term, weight in vectors[slug].items():
+            for other in self._postings[term]:
+                scores[other] += weight * vectors[other][term]
+        scores.pop(slug, None)
+        return scores
+
+    def _compute_row(self, slug, scores=None):
+        scores = self._scores(slug) if scores is None else scores
+        ranked = heapq.nlargest(self.capacity + 1, ((score, other) for other, score in scores.items()))
+        floor = ranked.pop()[0] if len(ranked) > self.capacity else 0.0
+        self._rows[slug] = [floor, ranked]
+
+    def _offer(self, slug, other, score):
+        """Update other's row with slug's new similarity; True if the row needs recomputing"""
+        row = self._rows[other]
+        neighbours = row[1]
+        neighbours[:] = [item for item in neighbours if item[1] != slug]
+        if score > row[0]:
+            neighbours.append((score, slug))
+            neighbours.sort(reverse=True)
+            if len(neighbours) > self.capacity:
+                row[0] = max(row[0], neighbours.pop()[0])
+        return len(neighbours) < self.k and row[0] > 0
+
+    def rebuild(self):
+        with self._lock:
+            self._postings = {}
+            self._vectors = {}
+            for slug, counts in self._counts.items():
+                self._set_vector(slug, self._vector(counts))
+            self._rows = {}
+            for slug in self._counts:
+                self._compute_row(slug)
+            self._built_size = len(self._counts)
+
+    def update(self, added, removed=()):
+        """Apply changes: ``added`` maps slug -> (fields, stamp) for new or edited posts.
+
+        Returns the slugs whose row changed.
+        """
+        with self._lock:
+            for slug in [*added, *removed]:
+                self._df.subtract(self._counts.pop(slug, Counter()).keys())
+                self._stamps.pop(slug, None)
+            self._df += Counter()  # Drop terms no post has any more
+            for slug, (fields, stamp) in added.items():
+                counts = self._counts[slug] = term_counts(fields)
+                self._df.update(counts.keys())
+                self._stamps[slug] = stamp
+
+            size = len(self._counts)
+            if abs(size - self._built_size) > REBUILD_DRIFT * max(self._built_size, 1):
+                self.rebuild()
+                return set(self._rows)
+
+            for slug in removed:
+                self._set_vector(slug, None)
+                self._rows.pop(slug, None)
+            for slug in added:
+                self._set_vector(slug, self._vector(self._counts[slug]))
+
+            touched = set(added)
+            stale = set()
+            for slug in removed:
+                for other, row in self._rows.items():
+                    if any(item[1] == slug for item in row[1]):
+                        touched.add(other)
+                        if self._offer(slug, other, 0.0):
+                            stale.add(other)
+            for slug in added:
+                scores = self._scores(slug)
+                self._compute_row(slug, scores)
+                for other in self._rows:
+                    if other in added:
+                        continue
+                    score = scores.get(other, 0.0)
+                    row = self._rows[other]
+                    if score > row[0] or any(item[1] == slug for item in row[1]):
+                        touched.add(other)
+                        if self._offer(slug, other, score):
+                            stale.add(other)
+            for slug in stale:
+                self._compute_row(slug)
+            return touched
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return dict(state, format=INDEX_FORMAT)
+
+    def __setstate__(self, state):
+        if state.pop('format', None) != INDEX_FORMAT:
+            raise ValueError('unsupported related posts index format')
+        self.__dict__.update(state, _lock=threading.RLock())
+
+
+class RelatedPosts:
+    """Related-posts table over the blog index, persisted between runs.
+
+    Works like BlogSearch: the first sync() loads the pickled table from
+    ``path``, then updates it with posts whose file stamp changed whenever
+    the blog index version moves. Looking up a post's neighbours is a dict
+    access.
+    """
+
+    def __init__(self, blog_index, k=4, path=None, logger=None):
+        self.blog_index = blog_index
+        self.k = k
+        self.path = path
+        self.logger = logger
+        self.index = None  # Loaded by the first sync()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, 'rb') as f:
+                    index = pickle.load(f)
+                if index.k == self.k:
+                    return index
+            except Exception as e:
+                if self.logger:
+                    self.logger.warning(f"Rebuilding related posts, could not load {self.path}: {str(e)}")
+        return RelatedIndex(self.k)
+
+    def save(self):
+        if not self.path:
+            return
+        # Every worker saves after the same change, so each writes its own temporary file
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(tmp, 'wb') as f:
+                pickle.dump(self.index, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            if self.logger:
+                self.logger.warning(f"Could not save related posts to {self.path}: {str(e)}")
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def sync(self):
+        """Bring the table up to date with the blog index; True if anything changed"""
+        posts = self.blog_index.posts()
+        if self.blog_index.version == self._version:
+            return False
+        with self._lock:
+            version = self.blog_index.version
+            if version == self._version:
+                return False
+            if self.index is None:
+                self.index = self._load()
+            added = {}
+            live = set()
+            for post in posts:
+                slug = post['slug']
+                live.add(slug)
+                stamp = self.blog_index.stamp(slug)
+                if stamp is None or stamp != self.index.stamp(slug):
+                    added[slug] = (post, stamp)
+            removed = set(self.index.slugs()) - live
+            if added or removed:
+                self.index.update(added, removed)
+                self.save()  # Under the lock, so no other sync changes the table or saves meanwhile
+            self._version = version
+        return bool(added or removed)
+
+    def neighbours(self, slug):
+        """Slugs of the posts related to a post, best first"""
+        self.sync()
+        return self.index.neighbours(slug)
+
+    def related(self, slug):
+        """Posts related to a post, best first"""
+        posts = (self.blog_index.get(other) for other in self.neighbours(slug))
+        return [post for post in posts if post is not None]
+
+
+def init_related_posts(app):
+    """Related posts shown under each blog post; the table is loaded or built on first use"""
+    related = RelatedPosts(app.extensions['blog_index'], app.config.get('RELATED_POSTS', 4),
+                           app.config.get('RELATED_INDEX_PATH'), app.logger)
+    app.extensions['related_posts'] = related
+    return related
@@ -0,0 +1,143 @@
+"""Build one audio sprite from the home page's sound effects.
+
+The WAV files listed in audio.SOUNDS are downmixed to mono and
+concatenated, with a short silence between sounds so codec padding can't
+bleed from one into the next. The sprite is written as Opus/OGG and MP3
+when an ffmpeg with libopus/libmp3lame is available, and always as WAV for
+browsers (or build machines) without either. Files and a manifest with each
+sound's start and duration go to static/assets/sprite/; the sound_sprite()
+template helper reads it. The sprite is rebuilt only when a source changed.
+
+    python scripts/build_audio_sprite.py [--ffmpeg PATH] [--force]
+"""
+import argparse
+import array
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import wave
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from audio import SOUNDS, SPRITE_DIR  # noqa: E402
+
+ASSETS_DIR = os.path.join(ROOT, 'static', 'assets')
+SPRITE_PATH = os.path.join(ROOT, 'static', SPRITE_DIR)
+MANIFEST_PATH = os.path.join(SPRITE_PATH, 'manifest.json')
+
+SAMPLE_RATE = 44100
+GAP_SECONDS = 0.1
+# Preferred first: the page plays the first format the browser supports
+ENCODINGS = [
+    ('sprite.ogg', 'audio/ogg; codecs=opus', 'libopus', ['-c:a', 'libopus', '-b:a', '64k']),
+    ('sprite.mp3', 'audio/mpeg', 'libmp3lame', ['-c:a', 'libmp3lame', '-q:a', '5']),
+]
+
+
+def read_mono(path):
+    """16-bit samples of a 16-bit PCM WAV file, downmixed to one channel"""
+    with wave.open(path, 'rb') as w:
+        if w.getsampwidth() != 2 or w.getframerate() != SAMPLE_RATE:
+            raise ValueError(f'{os.path.basename(path)}: expected 16-bit {SAMPLE_RATE} Hz PCM, got '
+                             f'{w.getsampwidth() * 8}-bit {w.getframerate()} Hz')
+        channels = w.getnchannels()
+        samples = array.array('h', w.readframes(w.getnframes()))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+    if channels == 1:
+        return samples
+    return array.array('h', (sum(samples[i:i + channels]) // channels for i in range(0, len(samples), channels)))
+
+
+def sources_hash(encoders):
+    h = hashlib.sha256(json.dumps([SOUNDS, GAP_SECONDS, encoders]).encode())
+    for source in SOUNDS.values():
+        with open(os.path.join(ASSETS_DIR, source), 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def available_encoders(ffmpeg):
+    """ffmpeg encoders from ENCODINGS this machine has, e.g. ['libopus', 'libmp3lame']"""
+    if not ffmpeg:
+        return []
+    try:
+        output = subprocess.run([ffmpeg, '-hide_banner', '-encoders'], capture_output=True, text=True,
+                                check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return []
+    names = {line.split()[1] for line in output.splitlines() if len(line.split()) > 1}
+    return [encoder for _, _, encoder, _ in ENCODINGS if encoder in names]
+
+
+def is_current(manifest, digest):
+    if not manifest or manifest.get('hash') != digest:
+        return False
+    return all(os.path.exists(os.path.join(SPRITE_PATH, entry['file'])) for entry in manifest['files'])
+
+
+def build_sprite(ffmpeg=None, force=False):
+    encoders = available_encoders(ffmpeg)
+    digest = sources_hash(encoders)
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    except (FileNotFoundError, ValueError):
+        previous = None
+    if not force and is_current(previous, digest):
+        print('Audio sprite is up to date')
+        return previous
+
+    gap = array.array('h', bytes(2 * round(GAP_SECONDS * SAMPLE_RATE)))
+    sprite = array.array('h')
+    sounds = {}
+    source_bytes = 0
+    for name, source in SOUNDS.items():
+        path = os.path.join(ASSETS_DIR, source)
+        samples = read_mono(path)
+        sounds[name] = {'start': round(len(sprite) / SAMPLE_RATE, 4),
+                        'duration': round(len(samples) / SAMPLE_RATE, 4)}
+        sprite.extend(samples)
+        sprite.extend(gap)
+        source_bytes += os.path.getsize(path)
+    if sys.byteorder == 'big':
+        sprite.byteswap()
+
+    os.makedirs(SPRITE_PATH, exist_ok=True)
+    wav_path = os.path.join(SPRITE_PATH, 'sprite.wav')
+    with wave.open(wav_path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(SAMPLE_RATE)
+        w.writeframes(sprite.tobytes())
+
+    files = []
+    for filename, mime, encoder, options in ENCODINGS:
+        if encoder not in encoders:
+            print(f'{filename}: skipped, ffmpeg with {encoder} not found')
+            continue
+        subprocess.run([ffmpeg, '-hide_banner', '-loglevel', 'error', '-y', '-i', wav_path, *options,
+                        os.path.join(SPRITE_PATH, filename)], check=True)
+        files.append({'file': filename, 'type': mime})
+    files.append({'file': 'sprite.wav', 'type': 'audio/wav'})
+    for entry in files:
+        entry['bytes'] = os.path.getsize(os.path.join(SPRITE_PATH, entry['file']))
+
+    manifest = {'hash': digest, 'sounds': sounds, 'files': files}
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    sizes = ', '.join(f"{entry['file']} {entry['bytes'] // 1024} KB" for entry in files)
+    print(f'{len(sounds)} sounds ({source_bytes // 1024} KB of WAV) -> {sizes}')
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ffmpeg', default=shutil.which('ffmpeg'), help='ffmpeg binary (default: from PATH)')
+    parser.add_argument('--force', action='store_true', help='rebuild even if no source changed')
+    args = parser.parse_args()
+    build_sprite(ffmpeg=args.ffmpeg, force=args.force)
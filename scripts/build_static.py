@@ -0,0 +1,160 @@
+"""Export the site as static files for serving from a CDN or nginx.
+
+Every page is rendered through the Flask test client into the build
+directory, and static/ is copied alongside it with content-hashed copies of
+each asset. Builds are incremental: a page is re-rendered only when one of
+its source files (content, templates, configuration or the Python app
+itself) changed since the last build.
+
+    python scripts/build_static.py [--out build] [--jobs N] [--force]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from site_pages import iter_site_pages
+
+STATE_FILE = '.build-state.json'
+
+_client = None
+_base_url = None
+
+
+def _init_worker():
+    global _client, _base_url
+    os.chdir(ROOT)
+    from app import app
+    _client = app.test_client()
+    _base_url = app.config['SITE_URL']
+
+
+def render_page(page, out_dir):
+    """Render one page into out_dir; runs in a worker process"""
+    response = _client.get(page['url'], base_url=_base_url)
+    if response.status_code != page['status']:
+        raise RuntimeError(f"{page['url']} returned {response.status_code}, expected {page['status']}")
+    target = os.path.join(out_dir, page['output'])
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    tmp = f'{target}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(response.get_data())
+    os.replace(tmp, target)
+    return page['url']
+
+
+def sources_digest(paths, cache):
+    """Hash the contents of a page's source files, memoizing per path"""
+    h = hashlib.sha256()
+    for path in paths:
+        if path not in cache:
+            try:
+                with open(os.path.join(ROOT, path), 'rb') as f:
+                    cache[path] = hashlib.sha256(f.read()).hexdigest()
+            except FileNotFoundError:
+                cache[path] = 'missing'
+        h.update(f'{path}:{cache[path]}\n'.encode())
+    return h.hexdigest()
+
+
+def copy_static(static_folder, out_dir, manifest):
+    """Mirror static/ into the build, plus a content-hashed copy of every file"""
+    target_root = os.path.join(out_dir, 'static')
+    copied = 0
+    for rel, hashed in manifest.items():
+        src = os.path.join(static_folder, rel)
+        st = os.stat(src)
+        for name in (rel, hashed):
+            dst = os.path.join(target_root, name)
+            try:
+                dst_st = os.stat(dst)
+                if dst_st.st_size == st.st_size and int(dst_st.st_mtime) == int(st.st_mtime):
+                    continue
+            except FileNotFoundError:
+                pass
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            shutil.copy2(src, dst)
+            copied += 1
+    with open(os.path.join(target_root, 'asset-manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return copied
+
+
+def write_css_bundles(bundles, out_dir):
+    """Write bundled stylesheets to the paths pages link them from"""
+    target_root = os.path.join(out_dir, 'assets', 'css')
+    os.makedirs(target_root, exist_ok=True)
+    for bundle in bundles.bundles():
+        target = os.path.join(target_root, bundle['filename'])
+        if not os.path.exists(target):
+            with open(target, 'wb') as f:
+                f.write(bundle['css'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', default=os.path.join(ROOT, 'build'), help='build directory')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--force', action='store_true', help='re-render every page')
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    from app import app
+
+    out_dir = os.path.abspath(args.out)
+    os.makedirs(out_dir, exist_ok=True)
+    state_path = os.path.join(out_dir, STATE_FILE)
+    try:
+        with open(state_path, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    except (FileNotFoundError, ValueError):
+        previous = {}
+
+    manifest = app.extensions['assets'].mapping()
+    copied = copy_static(app.static_folder, out_dir, manifest)
+    write_css_bundles(app.extensions['css_bundles'], out_dir)
+
+    # The app code can change any page, and pages embed hashed static URLs, so
+    # both are dependencies of every page
+    shared = sorted(name for name in os.listdir(ROOT) if name.endswith('.py'))
+    shared += ['static/asset-manifest.json', 'static/configurations/css-bundles.yaml']
+    digests = {'static/asset-manifest.json':
+               hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()}
+    pages = iter_site_pages(app)
+    state = {}
+    stale = []
+    for page in pages:
+        state[page['url']] = {'output': page['output'],
+                              'digest': sources_digest(shared + page['sources'], digests)}
+        unchanged = previous.get(page['url'], {}).get('digest') == state[page['url']]['digest']
+        if args.force or not unchanged or not os.path.exists(os.path.join(out_dir, page['output'])):
+            stale.append(page)
+
+    # Drop pages that no longer exist, e.g. deleted blog posts
+    for url, entry in previous.items():
+        if url not in state:
+            try:
+                os.remove(os.path.join(out_dir, entry['output']))
+            except FileNotFoundError:
+                pass
+
+    if stale:
+        jobs = max(1, min(args.jobs, len(stale)))
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+            for url in pool.map(render_page, stale, [out_dir] * len(stale)):
+                print(f'rendered {url}')
+
+    with open(state_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+    print(f'{len(stale)} of {len(pages)} pages rendered, {copied} static files copied to {out_dir}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""Generate responsive WebP/AVIF derivatives of every image under static/images.
+
+Each source image is resized to the widths below (never upscaled, and capped
+at the largest one) and encoded as WebP, plus AVIF when this Pillow build
+supports it. Results and a manifest go to static/images/derived/; the
+picture() template helper reads the manifest to emit <picture>/srcset
+markup. Images whose content hash is unchanged since the last run are
+skipped.
+
+    python scripts/generate_images.py [--jobs N] [--force]
+"""
+from PIL import Image, ImageOps
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STATIC_DIR = os.path.join(ROOT, 'static')
+IMAGES_DIR = os.path.join(STATIC_DIR, 'images')
+DERIVED_DIR = os.path.join(IMAGES_DIR, 'derived')
+MANIFEST_PATH = os.path.join(DERIVED_DIR, 'manifest.json')
+
+WIDTHS = [160, 320, 640, 960, 1280, 1920]
+SOURCE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.avif'}
+SKIP_DIRS = {'favicon', 'derived'}
+QUALITY = {'webp': 80, 'avif': 60}
+
+
+def output_formats():
+    """WebP always; AVIF only if Pillow can encode it"""
+    formats = ['webp']
+    if '.avif' in Image.registered_extensions():
+        formats.insert(0, 'avif')
+    return formats
+
+
+def find_sources():
+    """Source images as paths relative to static/images"""
+    sources = []
+    for dirpath, dirnames, filenames in os.walk(IMAGES_DIR):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIP_DIRS)
+        for name in sorted(filenames):
+            if os.path.splitext(name)[1].lower() in SOURCE_EXTENSIONS:
+                full = os.path.join(dirpath, name)
+                sources.append(os.path.relpath(full, IMAGES_DIR).replace(os.sep, '/'))
+    return sources
+
+
+def content_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def generate(rel, digest, formats):
+    """Write every derivative of one source image; runs in a worker process"""
+    variants = {fmt: [] for fmt in formats}
+    with Image.open(os.path.join(IMAGES_DIR, rel)) as img:
+        # Derivatives carry no EXIF, so turn photos upright from their orientation tag first
+        img = ImageOps.exif_transpose(img)
+
+        # Keep transparency where the source has it
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA' if img.mode in ('LA', 'PA') or 'transparency' in img.info else 'RGB')
+
+        stem = os.path.splitext(rel)[0]
+        widths = [w for w in WIDTHS if w < img.width] + [min(img.width, WIDTHS[-1])]
+        for width in widths:
+            height = round(img.height * width / img.width)
+            resized = img if width == img.width else img.resize((width, height), Image.Resampling.LANCZOS)
+            for fmt in formats:
+                out_rel = f'images/derived/{stem}-{width}.{fmt}'
+                out_path = os.path.join(STATIC_DIR, out_rel)
+                os.makedirs(os.path.dirname(out_path), exist_ok=True)
+                resized.save(out_path, fmt.upper(), quality=QUALITY[fmt])
+                variants[fmt].append({'width': width, 'path': out_rel, 'bytes': os.path.getsize(out_path)})
+        size = img.size
+
+    return rel, {
+        'hash': digest,
+        'width': size[0],
+        'height': size[1],
+        'bytes': os.path.getsize(os.path.join(IMAGES_DIR, rel)),
+        'variants': variants,
+    }
+
+
+def is_current(entry, digest, formats):
+    if not entry or entry['hash'] != digest or set(entry['variants']) != set(formats):
+        return False
+    return all(os.path.exists(os.path.join(STATIC_DIR, v['path']))
+               for fmt in formats for v in entry['variants'][fmt])
+
+
+def generate_images(jobs=None, force=False):
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+    except (FileNotFoundError, ValueError):
+        previous = {}
+
+    formats = output_formats()
+    manifest = {}
+    pending = []
+    processed = 0
+    for rel in find_sources():
+        digest = content_hash(os.path.join(IMAGES_DIR, rel))
+        if not force and is_current(previous.get(rel), digest, formats):
+            manifest[rel] = previous[rel]
+        else:
+            pending.append((rel, digest))
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(generate, rel, digest, formats) for rel, digest in pending]
+            for future in futures:
+                try:
+                    rel, entry = future.result()
+                except Exception as e:
+                    print(f'skipped: {e}')
+                    continue
+                manifest[rel] = entry
+                processed += 1
+                best = min(entry['variants'][formats[-1]], key=lambda v: abs(v['width'] - 640))
+                print(f"{rel}: {entry['bytes'] // 1024} KB -> {best['bytes'] // 1024} KB at {best['width']}w")
+
+    os.makedirs(DERIVED_DIR, exist_ok=True)
+    with open(MANIFEST_PATH, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    print(f'{processed} of {len(manifest)} images processed ({", ".join(formats)})')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--force', action='store_true', help='regenerate every image')
+    args = parser.parse_args()
+    generate_images(jobs=args.jobs, force=args.force)
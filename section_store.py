@@ -0,0 +1,96 @@
+import os
+import re
+import threading
+import time
+
+from metrics import span
+
+# Offering list headings in content/offerings/index.md and their keys
+OFFERING_SECTIONS = [
+    ('## Product Development', 'product_development'),
+    ('## Product Management', 'product_management'),
+    ('## Training & Workshops', 'training_workshops'),
+]
+
+
+def _markdown(text):
+    import markdown  # Only needed once a section is parsed, not at startup
+    return markdown.markdown(text)
+
+
+@span('parse_section')
+def parse_section(text):
+    """Parse a section's markdown into title, description, HTML and offering lists"""
+    lines = text.split('\n')
+    title = lines[0].strip('# ') if lines and lines[0].startswith('#') else ""
+
+    # Extract first paragraph for description
+    description = ""
+    for line in lines[1:]:
+        if line.strip() and not line.startswith('#'):
+            description = re.sub(r'[#*`_]', '', line).strip()
+            break
+
+    offerings = {key: [] for _, key in OFFERING_SECTIONS}
+    current_section = None
+    for line in lines:
+        line = line.strip()
+        for heading, key in OFFERING_SECTIONS:
+            if line.startswith(heading):
+                current_section = key
+                break
+        else:
+            if line.startswith('- ') and current_section:
+                offerings[current_section].append(line[2:].strip())
+
+    return {
+        'title': title,
+        'description': description,
+        'html': _markdown(text),
+        'offerings': offerings,
+    }
+
+
+class SectionStore:
+    """Parsed content/<section>/index.md files, memoized by mtime.
+
+    Each file is read and rendered once, then re-parsed only when its mtime
+    or size changes. Files are re-stat'ed at most every ``check_interval``
+    seconds, so steady-state page views don't touch the disk.
+    """
+
+    def __init__(self, content_dir, check_interval=0):
+        self.content_dir = content_dir
+        self.check_interval = check_interval
+        self._sections = {}
+        self._lock = threading.Lock()
+
+    def _load(self, path, cached):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return {'stamp': None, 'section': None}
+        stamp = (st.st_mtime_ns, st.st_size)
+        if cached and cached['stamp'] == stamp:
+            return cached
+        with open(path, 'r', encoding='utf-8') as f:
+            return {'stamp': stamp, 'section': parse_section(f.read())}
+
+    def invalidate(self):
+        """Make the next access to each section re-check its file"""
+        with self._lock:
+            self._sections = {key: dict(cached, checked=float('-inf')) for key, cached in self._sections.items()}
+
+    def get(self, directory, filename='index.md'):
+        """Parsed section dict, or None if the file doesn't exist"""
+        key = (directory, filename)
+        cached = self._sections.get(key)
+        now = time.monotonic()
+        if cached is None or now - cached['checked'] >= self.check_interval:
+            with self._lock:
+                cached = self._sections.get(key)
+                if cached is None or now - cached['checked'] >= self.check_interval:
+                    cached = dict(self._load(os.path.join(self.content_dir, directory, filename), cached),
+                                  checked=time.monotonic())
+                    self._sections[key] = cached
+        return cached['section']
@@ -0,0 +1,67 @@
+import glob
+import os
+
+# Section pages rendered from content/<section>/index.md: (url, section, template)
+SECTION_PAGES = [
+    ('/', 'home', 'index.html'),
+    ('/offerings', 'offerings', 'pages/offerings.html'),
+    ('/solutions', 'solutions', 'pages/solutions.html'),
+    ('/resume', 'resume', 'pages/resume.html'),
+]
+
+
+def output_path(url, file=False):
+    """File a URL is written to in a static build: /blog/x -> blog/x/index.html.
+
+    File routes (feeds, sitemaps, robots.txt, API responses) are written to
+    their path as-is. Pages always get a directory with an index.html, even
+    when their slug has a dot in it.
+    """
+    path = url.strip('/')
+    if not path:
+        return 'index.html'
+    if file:
+        return path
+    return f'{path}/index.html'
+
+
+def iter_site_pages(app):
+    """List every public page with the files its output depends on.
+
+    Each page is a dict with the URL, the expected status code, and the
+    source files (content, templates, configuration) whose changes require
+    re-rendering it. Paths are relative to the app root.
+    """
+    root = app.root_path
+    content_dir = str(app.config['CONTENT_DIR'])
+    blog_dir = os.path.join(content_dir, 'blogs')
+    blog_sources = sorted(os.path.relpath(p, root)
+                          for p in glob.glob(os.path.join(root, blog_dir, '*.md')))
+
+    def page(url, *sources, status=200, file=False):
+        return {'url': url, 'output': output_path(url, file), 'status': status, 'sources': list(sources)}
+
+    pages = []
+    for url, section, template in SECTION_PAGES:
+        pages.append(page(url, os.path.join(content_dir, section, 'index.md'),
+                          f'templates/{template}', 'templates/base.html'))
+    pages.append(page('/tools', 'templates/pages/tools.html', 'templates/base.html'))
+    pages.append(page('/blogs', *blog_sources, 'templates/pages/blogs.html', 'templates/base.html'))
+    related = app.extensions['related_posts']
+    for post in app.extensions['blog_index'].posts():
+        # A post page also shows the titles of its related posts
+        pages.append(page(f"/blog/{post['slug']}", os.path.join(blog_dir, f"{post['slug']}.md"),
+                          *(os.path.join(blog_dir, f'{slug}.md') for slug in related.neighbours(post['slug'])),
+                          'templates/pages/blog.html', 'templates/base.html'))
+    sitemap_sources = [*blog_sources, 'templates/pages/tools.html', 'templates/pages/blogs.html']
+    for _, section, template in SECTION_PAGES:
+        sitemap_sources += [os.path.join(content_dir, section, 'index.md'), f'templates/{template}']
+    for name in app.extensions['sitemap'].names():
+        pages.append(page(f'/{name}', *sitemap_sources, file=True))
+    for url in ('/feed.xml', '/atom.xml', '/feed.json'):
+        pages.append(page(url, *blog_sources, file=True))
+    pages.append(page('/robots.txt', file=True))
+    pages.append(page('/api/tracking-config', 'static/configurations/tracking.yaml', file=True))
+    pages.append({'url': '/404', 'output': '404.html', 'status': 404,
+                  'sources': ['templates/404.html', 'templates/base.html']})
+    return pages
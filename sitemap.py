@@ -0,0 +1,157 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import Response
+
+from site_pages import SECTION_PAGES
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+XML_DECLARATION = b"<?xml version='1.0' encoding='utf-8'?>\n"
+MAX_URLS = 50000  # Per sitemap file, from the sitemaps.org protocol
+
+
+def _element(tag, **children):
+    """Serialize <tag><child>text</child>...</tag> without an XML declaration"""
+    from xml.etree import ElementTree as ET  # Imported when a sitemap is first built
+    element = ET.Element(tag)
+    for name, text in children.items():
+        ET.SubElement(element, name).text = text
+    return ET.tostring(element, encoding='unicode').encode('utf-8')
+
+
+def _day(mtime):
+    return datetime.fromtimestamp(mtime).strftime('%Y-%m-%d')
+
+
+class Sitemap:
+    """sitemap.xml kept serialized in memory.
+
+    Every URL is stored as a ready-made <url> fragment. A blog post's
+    fragment is rebuilt only when its file changes, and main pages take
+    ``lastmod`` from their markdown and template mtimes, so the output stays
+    byte-identical until content actually changes. Past MAX_URLS the URLs are
+    split into sitemap-<n>.xml files listed by a sitemap index.
+    """
+
+    def __init__(self, app, check_interval=0):
+        self.app = app
+        self.check_interval = check_interval
+        self.version = None
+        self._stamp = None
+        self._posts = {}
+        self._documents = {}
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def _main_pages(self):
+        """(path, source files) for each main page"""
+        content_dir = str(self.app.config['CONTENT_DIR'])
+        template_dir = os.path.join(self.app.root_path, self.app.template_folder)
+        pages = [(url.strip('/'), [os.path.join(content_dir, section, 'index.md'),
+                                   os.path.join(template_dir, template)])
+                 for url, section, template in SECTION_PAGES]
+        pages.append(('tools', [os.path.join(template_dir, 'pages', 'tools.html')]))
+        pages.append(('blogs', [os.path.join(template_dir, 'pages', 'blogs.html')]))
+        return pages
+
+    def _mtime(self, paths):
+        mtimes = []
+        for path in paths:
+            try:
+                mtimes.append(os.stat(path).st_mtime)
+            except OSError:
+                pass
+        return max(mtimes, default=0)
+
+    def refresh(self):
+        """Rebuild fragments for whatever changed since the last check"""
+        now = time.monotonic()
+        if self.version is not None and now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            blog_index = self.app.extensions['blog_index']
+            posts = blog_index.posts()
+            main_pages = self._main_pages()
+            stamp = (blog_index.version, tuple(self._mtime(sources) for _, sources in main_pages))
+            self._last_check = time.monotonic()
+            if stamp == self._stamp:
+                return
+
+            site_url = self.app.config['SITE_URL']
+            fragments = {}
+            for post in posts:
+                post_stamp = blog_index.stamp(post['slug'])
+                mtime = post_stamp[0] / 1e9 if post_stamp and post_stamp[0] else time.time()
+                cached = self._posts.get(post['slug'])
+                if cached is None or cached[1] != mtime:
+                    cached = (_element('url', loc=f"{site_url}/blog/{post['slug']}", lastmod=_day(mtime),
+                                       changefreq='monthly', priority='0.7'), mtime)
+                fragments[post['slug']] = cached
+
+            # The blog listing changes whenever any post does
+            newest_post = max((mtime for _, mtime in fragments.values()), default=0)
+            urls = []
+            for (page, _), mtime in zip(main_pages, stamp[1]):
+                if page == 'blogs':
+                    mtime = max(mtime, newest_post)
+                urls.append((_element('url', loc=f'{site_url}/{page}' if page else site_url,
+                                      lastmod=_day(mtime or time.time()),
+                                      changefreq='weekly', priority='0.8' if page else '1.0'), mtime))
+            urls.extend(fragments.values())
+
+            self._posts = fragments
+            self._documents = self._split(urls, site_url)
+            self._stamp = stamp
+            self.version = hashlib.sha256(repr(stamp).encode()).hexdigest()[:16]
+
+    def _split(self, urls, site_url):
+        """Map document names to their bodies: one urlset, or an index plus parts.
+
+        Each document is joined once into a single body, so the page cache
+        can store and compress it like any other page.
+        """
+        def urlset(items):
+            return b''.join([XML_DECLARATION, f'<urlset xmlns="{SITEMAP_NS}">'.encode(),
+                             *(fragment for fragment, _ in items), b'</urlset>'])
+
+        if len(urls) <= MAX_URLS:
+            return {'sitemap.xml': urlset(urls)}
+
+        documents = {}
+        index = [XML_DECLARATION, f'<sitemapindex xmlns="{SITEMAP_NS}">'.encode()]
+        for number, start in enumerate(range(0, len(urls), MAX_URLS), 1):
+            part = urls[start:start + MAX_URLS]
+            name = f'sitemap-{number}.xml'
+            documents[name] = urlset(part)
+            index.append(_element('sitemap', loc=f'{site_url}/{name}',
+                                  lastmod=_day(max(mtime for _, mtime in part))))
+        index.append(b'</sitemapindex>')
+        documents['sitemap.xml'] = b''.join(index)
+        return documents
+
+    def invalidate(self):
+        """Make the next access re-check posts and page sources"""
+        self._last_check = float('-inf')
+
+    def names(self):
+        """Every sitemap document currently published"""
+        self.refresh()
+        return list(self._documents)
+
+    def response(self, name):
+        """Response for one sitemap document, or None if it doesn't exist"""
+        self.refresh()
+        body = self._documents.get(name)
+        if body is None:
+            return None
+        return Response(body, mimetype='application/xml')
+
+
+def init_sitemap(app):
+    """Shared sitemap builder, refreshed at most every CONTENT_RELOAD_INTERVAL seconds"""
+    sitemap = Sitemap(app, check_interval=app.config.get('CONTENT_RELOAD_INTERVAL', 0))
+    app.extensions['sitemap'] = sitemap
+    return sitemap
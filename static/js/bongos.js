@@ -1,102 +1,142 @@
 document.addEventListener('DOMContentLoaded', () => {
     const bongos = document.querySelectorAll('.bongo');
-    
+    const spriteElement = document.getElementById('sound-sprite');
+    const sprite = spriteElement ? JSON.parse(spriteElement.textContent) : { files: [], sounds: {} };
+
     // Create an AudioContext for lower latency playback with optimal settings
     const AudioContext = window.AudioContext || window.webkitAudioContext;
     const audioContext = new AudioContext({
         latencyHint: 'interactive',
         sampleRate: 44100
     });
-    
-    // Audio buffer storage
-    const buffers = { 'c': null, 'v': null, 'b': null, 'n': null };
-    
-    // File mapping
-    const fileMap = {
-        'c': '/static/assets/Bongo2_trimmed.wav',
-        'v': '/static/assets/Bongo3_trimmed.wav',
-        'b': '/static/assets/Bongo4_trimmed.wav',
-        'n': '/static/assets/Bongo1_trimmed.wav'
-    };
-    
-    // Preload all audio files into buffers
+
+    // Key to sound mapping
+    const keySounds = { 'c': 'bongo-c', 'v': 'bongo-v', 'b': 'bongo-b', 'n': 'bongo-n' };
+
+    // Sprite file: the first format (Opus, MP3, WAV) this browser can decode
+    const probe = document.createElement('audio');
+    const spriteFile = sprite.files.find(file => probe.canPlayType(file.type) !== '');
+
+    // Decoded audio per URL; one for the whole sprite, or one per sound without it
+    const buffers = {};
+    let loading = null;
+
+    function soundUrl(sound) {
+        return sound.url || (spriteFile && spriteFile.url);
+    }
+
+    // Fetch and decode the sprite once, on first interaction or when the browser is idle
     function loadSounds() {
-        const promises = Object.entries(fileMap).map(([key, url]) => {
+        if (loading) return loading;
+        const urls = [...new Set(Object.values(sprite.sounds).map(soundUrl).filter(Boolean))];
+        loading = Promise.all(urls.map(url => {
             return fetch(url)
-                .then(response => response.arrayBuffer())
+                .then(response => {
+                    if (!response.ok) throw new Error(`${url}: ${response.status}`);
+                    return response.arrayBuffer();
+                })
                 .then(arrayBuffer => audioContext.decodeAudioData(arrayBuffer))
                 .then(audioBuffer => {
-                    buffers[key] = audioBuffer;
+                    buffers[url] = audioBuffer;
                 });
+        })).catch(e => {
+            // Let the next interaction try again
+            loading = null;
+            console.log('Sounds could not be loaded');
         });
-        
-        return Promise.all(promises);
+        return loading;
     }
-    
-    // Ultra-low-latency sound playback function - creates new AudioBufferSourceNode each time
-    function playBongo(key) {
-        const bongo = document.querySelector(`.bongo[data-key="${key}"]`);
-        if (!buffers[key] || !bongo) return;
-        
+
+    // Play one sound from the sprite - creates a new AudioBufferSourceNode each time
+    function playSound(name, volume = 1) {
+        const sound = sprite.sounds[name];
+        const buffer = sound && buffers[soundUrl(sound)];
+        if (!buffer) {
+            loadSounds();
+            return false;
+        }
+
         // Create a new source for each playback to allow overlapping sounds
         const source = audioContext.createBufferSource();
-        source.buffer = buffers[key];
-        
-        // Connect directly to destination for lowest latency
-        source.connect(audioContext.destination);
-        
-        // Start playback immediately with no delay
-        source.start(0);
-        
+        source.buffer = buffer;
+
+        // Connect directly to destination for lowest latency, through a gain node only when quieter
+        if (volume === 1) {
+            source.connect(audioContext.destination);
+        } else {
+            const gain = audioContext.createGain();
+            gain.gain.value = volume;
+            source.connect(gain).connect(audioContext.destination);
+        }
+
+        // Start playback immediately, at the sound's offset in the sprite
+        source.start(0, sound.start, sound.duration || undefined);
+        return true;
+    }
+
+    function playBongo(key) {
+        const bongo = document.querySelector(`.bongo[data-key="${key}"]`);
+        if (!bongo || !playSound(keySounds[key])) return;
+
         // Add visual feedback using minimal processing
         bongo.classList.add('playing');
-        
+
         // Schedule removal with minimal delay
         setTimeout(() => {
             bongo.classList.remove('playing');
         }, 50);
     }
-    
-    // Initialize - resume audio context and load sounds
+
+    // Shared with magnets.js
+    window.soundEffects = { play: playSound, load: loadSounds };
+
+    // Initialize - resume audio context, then load sounds once the page is idle
     function init() {
         // Resume AudioContext immediately
         audioContext.resume();
-        
-        // Handle all interaction types to unblock audio on iOS/mobile
+
+        // Handle all interaction types to unblock audio on iOS/mobile, and start loading if not yet
         ['touchstart', 'mousedown', 'keydown'].forEach(event => {
             document.addEventListener(event, function unlockAudio() {
+                loadSounds();
                 audioContext.resume().then(() => {
                     document.removeEventListener(event, unlockAudio);
                 });
             }, { once: true, passive: true });
         });
-        
-        // Load all sound buffers
-        loadSounds().then(() => {
-            // Handle clicks with optimized event handling
-            bongos.forEach(bongo => {
-                // Use minimal handler for instant response
-                const handler = (e) => {
-                    if (e.type === 'touchstart') e.preventDefault();
-                    const key = bongo.dataset.key;
-                    playBongo(key);
-                };
-                
-                // Register for both mouse and touch with optimizations
-                bongo.addEventListener('mousedown', handler, { passive: true });
-                bongo.addEventListener('touchstart', handler, { passive: false });
-            });
-            
-            // Handle keyboard events
-            document.addEventListener('keydown', (e) => {
-                const key = e.key.toLowerCase();
-                if (['c', 'v', 'b', 'n'].includes(key)) {
-                    playBongo(key);
-                }
-            }, { passive: true });
+
+        // Keep the sprite off the critical path: fetch it after the page has loaded
+        window.addEventListener('load', () => {
+            if ('requestIdleCallback' in window) {
+                requestIdleCallback(loadSounds, { timeout: 3000 });
+            } else {
+                setTimeout(loadSounds, 1000);
+            }
+        }, { once: true });
+
+        // Handle clicks with optimized event handling
+        bongos.forEach(bongo => {
+            // Use minimal handler for instant response
+            const handler = (e) => {
+                if (e.type === 'touchstart') e.preventDefault();
+                const key = bongo.dataset.key;
+                playBongo(key);
+            };
+
+            // Register for both mouse and touch with optimizations
+            bongo.addEventListener('mousedown', handler, { passive: true });
+            bongo.addEventListener('touchstart', handler, { passive: false });
         });
+
+        // Handle keyboard events
+        document.addEventListener('keydown', (e) => {
+            const key = e.key.toLowerCase();
+            if (['c', 'v', 'b', 'n'].includes(key)) {
+                playBongo(key);
+            }
+        }, { passive: true });
     }
-    
+
     // Start initialization
     init();
-}); 
\ No newline at end of file
+});
@@ -3,9 +3,10 @@ document.addEventListener('DOMContentLoaded', () => {
     const container = document.querySelector('.magnet-container');
     const magnetPlayground = document.querySelector('.magnet-playground');
     
-    // Create audio element for snap sound
-    const snapSound = new Audio('/static/assets/snap_trimmed.wav');
-    snapSound.volume = 0.6;
+    // Snap sound comes from the shared sprite loaded by bongos.js
+    function playSnap() {
+        if (window.soundEffects) window.soundEffects.play('snap', 0.6);
+    }
     
     const containerBounds = {
         min: 0,
@@ -75,8 +76,7 @@ document.addEventListener('DOMContentLoaded', () => {
             newRightPos = centerOffset + 40;
             
             if (!lastAttracted && !instant) {
-                snapSound.currentTime = 0;
-                snapSound.play().catch(e => console.log('Sound play prevented'));
+                playSnap();
             }
         } else {
             // Always move to full repulsion
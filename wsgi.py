@@ -0,0 +1,28 @@
+"""Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+
+Importing this module loads .env, turns on PREWARM_ENABLED unless the
+environment sets it, builds the app, warms every cache and renders every
+page into the page cache. With preload_app the work happens once in the
+gunicorn master and each forked worker starts with it already in memory.
+"""
+import os
+
+from flask.cli import load_dotenv
+
+load_dotenv()
+# Pre-rendering needs a long-running process, which this entry point is
+os.environ.setdefault('FLASK_PREWARM_ENABLED', 'true')
+
+from app import app  # noqa: E402 - the environment must be loaded first
+from prewarm import warm_caches  # noqa: E402
+
+
+def prerender(app):
+    """Render every page ahead of the first visitor, if pre-warming is enabled"""
+    prewarm = app.extensions.get('prewarm')
+    if prewarm is not None:
+        prewarm.render_all()
+
+
+warm_caches(app)
+prerender(app)